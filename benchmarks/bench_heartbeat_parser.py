@@ -0,0 +1,134 @@
+"""Micro-benchmark: heartbeat.parse_heartbeat vs. the inline re.search parsing it replaced.
+
+    python benchmarks/bench_heartbeat_parser.py [messages] [rounds]
+
+Two access patterns are timed: the heartbeat handler in on_message, which
+reads every field, and the channel history scans (stats, PPM), which only need
+the type, the 13P+ flag and the average PPM.
+
+The corpus mimics what lands in the home channels: mostly Wonderpick 96P+
+heartbeats, with some 13P+, Create Bots and Tradeable messages mixed in.
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from heartbeat import parse_heartbeat  # noqa: E402
+
+TYPES = [
+    ("Inject Wonderpick 96P+", 70),
+    ("Inject Wonderpick 96P+ 1P Method", 3),
+    ("Inject 13P+", 10),
+    ("Create Bots (13P)", 7),
+    ("Inject Wonderpick", 10),
+]
+PACKS = ["MegaGyarados", "MegaBlaziken", "MegaAltaria", "CrimsonBlaze", "Mewtwo", "Pikachu", "Charizard"]
+
+
+def make_heartbeat(rng):
+    instances = ["Main"] + [str(i) for i in range(1, rng.randint(1, 8))]
+    offline = [str(i) for i in range(9, 9 + rng.choice([0, 0, 0, 1, 2]))]
+    minutes = rng.randint(1, 600)
+    packs = minutes * rng.randint(2, 4)
+    hb_type = rng.choices([t for t, _ in TYPES], weights=[w for _, w in TYPES])[0]
+    lines = [
+        f"Online: {', '.join(instances)}",
+        f"Offline: {', '.join(offline) if offline else 'none'}",
+        f"Time: {minutes}m | Packs: {packs} | Avg: {packs / minutes:.2f} packs/min",
+        f"Type: {hb_type}",
+        f"Opening: {', '.join(rng.sample(PACKS, rng.randint(1, 3)))}",
+    ]
+    if rng.random() < 0.05:
+        lines.insert(0, "Tradeable cards found")
+    return "\n".join(lines)
+
+
+def legacy_handler(content):
+    """The old on_message parsing, kept here as the baseline."""
+    if "Tradeable" in content:
+        return None
+    time_match = re.search(r"Time:\s*(\d+)m", content)
+    packs_match = re.search(r"Packs:\s*(\d+)", content)
+    opening_match = re.search(r"Opening:\s*(.+)", content)
+    ppm_match = re.search(r"Avg:\s*([\d\.]+)\s*packs/min", content)
+    quiet = "Type: Inject 13P+" in content or "Type: Create Bots (13P)" in content
+    policed = "Type: Inject Wonderpick 96P+" in content
+    one_p = "1P Method" in content
+    opening = opening_match.group(1).replace(",", " ").split() if opening_match else None
+
+    instance_count = 0
+    online_line_match = re.search(r"Online:\s*(.+)", content, re.IGNORECASE)
+    if online_line_match:
+        on_str = online_line_match.group(1).strip()
+        if on_str.lower() != "none":
+            items = [x.strip() for x in on_str.split(',') if x.strip()]
+            instance_count = len([x for x in items if x.lower() != "main"])
+    offline_count = 0
+    offline_line_match = re.search(r"Offline:\s*(.+)", content, re.IGNORECASE)
+    if offline_line_match:
+        off_str = offline_line_match.group(1).strip()
+        if off_str.lower() != "none":
+            offline_count = len([x for x in off_str.split(',') if x.strip()])
+    return (int(time_match.group(1)) if time_match else 0,
+            int(packs_match.group(1)) if packs_match else 0,
+            float(ppm_match.group(1)) if ppm_match else None,
+            quiet, policed, one_p, opening, instance_count, offline_count)
+
+
+def legacy_scan(content):
+    if "Type: Inject Wonderpick" not in content: return None
+    if "Inject 13P+" in content: return None
+    ppm = 0.0
+    ppm_match = re.search(r"Avg:\s*([\d\.]+)\s*packs/min", content)
+    if ppm_match:
+        try: ppm = float(ppm_match.group(1))
+        except: pass
+    return ppm
+
+
+def new_scan(content):
+    hb = parse_heartbeat(content)
+    if not hb.is_wonderpick: return None
+    if hb.inject_13p: return None
+    return hb.avg_ppm or 0.0
+
+
+def new_handler(content):
+    hb = parse_heartbeat(content)
+    if hb.tradeable:
+        return None
+    return (hb.time or 0, hb.packs or 0, hb.avg_ppm, hb.is_quiet_removal, hb.is_96p,
+            hb.one_p_method, list(hb.opening) if hb.opening is not None else None,
+            hb.instances, hb.offline_instances)
+
+
+def bench(fn, corpus, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for content in corpus:
+            fn(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rng = random.Random(1234)
+    corpus = [make_heartbeat(rng) for _ in range(count)]
+
+    mismatches = sum(1 for c in corpus if legacy_handler(c) != new_handler(c) or legacy_scan(c) != new_scan(c))
+    print(f"corpus: {count} heartbeats, {mismatches} parse mismatches")
+
+    for label, fn in (("handler, legacy", legacy_handler), ("handler, parser", new_handler),
+                      ("history, legacy", legacy_scan), ("history, parser", new_scan)):
+        elapsed = bench(fn, corpus, rounds)
+        print(f"{label:>16}: {elapsed / count * 1e6:6.2f} us/msg  ({count / elapsed:,.0f} msg/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""Replay benchmark: a synthetic heartbeat stream pushed through MyBot, offline.
+
+    python benchmarks/bench_replay.py [members] [cycles] [--recorded FILE]
+
+Builds a guild of fake members, each with a home-* channel and a users.json
+record, then replays `cycles` rounds of heartbeats (one per member per round,
+in shuffled order) through MyBot.on_message. The stream mixes Wonderpick 96P+
+(a few of them breaking a rule), 13P+, Create Bots, Tradeable and god pack
+log messages. post_aggregated_stats (cold hydration from channel history, then
+warm) and update_heartbeat_ppm are timed around the replay.
+
+--recorded FILE replays real heartbeats instead: a JSON Lines file with a
+"content" field per line (the raw webhook text), handed out to the fake
+members in turn.
+
+Nothing leaves the process: Discord objects are fakes, the GitHub engine is a
+stub that only diffs and counts bytes, and the public ID lists are preseeded.
+The bot writes users.json/samples.bin into a temporary directory.
+
+Reports messages/sec, p50/p99 latency of on_message (the gateway event, which
+only queues the heartbeat) and of the heartbeat handling the ingest workers
+do, and bytes written per message (local files plus what would have been
+pushed to GitHub).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+PACKS = ["MegaGyarados", "MegaBlaziken", "MegaAltaria", "CrimsonBlaze", "Mewtwo", "Pikachu", "Charizard"]
+# (kind, weight): what a member's webhook posts in one round
+KINDS = [
+    ("96p", 80),
+    ("96p_1p", 1),
+    ("13p", 6),
+    ("create_bots", 2),
+    ("wonderpick", 5),
+    ("tradeable", 4),
+    ("god_pack", 2),
+]
+
+
+# --- FAKE DISCORD ---
+class FakeRole:
+    def __init__(self, role_id, name, default=False):
+        self.id = role_id
+        self.name = name
+        self._default = default
+
+    def is_default(self):
+        return self._default
+
+
+class FakeMember:
+    def __init__(self, member_id, name, guild, bot=False):
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.guild = guild
+        self.roles = [guild.default_role]
+        self.mention = f"<@{member_id}>"
+
+    async def edit(self, roles=None, **_):
+        if roles is not None:
+            self.roles = [self.guild.default_role] + list(roles)
+
+
+class FakeMessage:
+    _next_id = 1_400_000_000_000_000_000
+
+    def __init__(self, channel, content, author, webhook_id=None, created_at=None):
+        FakeMessage._next_id += 1
+        self.id = FakeMessage._next_id
+        self.channel = channel
+        self.content = content or ""
+        self.author = author
+        self.webhook_id = webhook_id
+        self.created_at = created_at or datetime.now(timezone.utc)
+        self.attachments = []
+        self.mentions = []
+        self.embeds = []
+
+    async def delete(self):
+        pass
+
+
+class FakeChannel:
+    def __init__(self, channel_id, name, guild, members=()):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.members = list(members)
+        self.messages = []
+        self.mention = f"<#{channel_id}>"
+        self.sent = 0
+
+    async def send(self, content=None, embed=None, files=None, **_):
+        message = FakeMessage(self, content, self.guild.me)
+        self.messages.append(message)
+        self.sent += 1
+        return message
+
+    async def edit(self, name=None, **_):
+        if name is not None:
+            self.name = name
+        return self
+
+    async def history(self, limit=100, after=None, oldest_first=None):
+        messages = self.messages
+        if after is not None:
+            if isinstance(after, datetime):
+                messages = [m for m in messages if m.created_at > after]
+            else:
+                messages = [m for m in messages if m.id > after.id]
+        if oldest_first is None:
+            oldest_first = after is not None
+        if not oldest_first:
+            messages = messages[::-1]
+        if limit is not None:
+            messages = messages[:limit]
+        for message in messages:
+            yield message
+
+
+class FakeGuild:
+    def __init__(self, guild_id, name):
+        self.id = guild_id
+        self.name = name
+        self.default_role = FakeRole(guild_id, "@everyone", default=True)
+        self.roles = [self.default_role]
+        self.members = []
+        self.text_channels = []
+        self.categories = []
+        self._members = {}
+        self.me = None
+
+    def add_member(self, member):
+        self.members.append(member)
+        self._members[member.id] = member
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+    def get_role(self, role_id):
+        return next((r for r in self.roles if r.id == role_id), None)
+
+    async def create_role(self, name, **_):
+        role = FakeRole(10_000 + len(self.roles), name)
+        self.roles.append(role)
+        return role
+
+
+# --- SCENARIO ---
+def make_heartbeat(rng, kind, state):
+    """Next heartbeat text for one member; state carries their running time/packs."""
+    state["time"] += 30
+    ppm = state["ppm"]
+    if kind != "96p_1p" or rng.random() < 0.5:
+        state["packs"] += int(30 * ppm)
+    online = ["Main"] + [str(i) for i in range(1, state["instances"] + 1)]
+    offline = [str(i) for i in range(9, 9 + rng.choice([0, 0, 0, 0, 1]))]
+    hb_type = {
+        "96p": "Inject Wonderpick 96P+",
+        "96p_1p": "Inject Wonderpick 96P+ 1P Method",
+        "13p": "Inject 13P+",
+        "create_bots": "Create Bots (13P)",
+        "wonderpick": "Inject Wonderpick",
+    }.get(kind, "Inject Wonderpick 96P+")
+    lines = [
+        f"Online: {', '.join(online)}",
+        f"Offline: {', '.join(offline) if offline else 'none'}",
+        f"Time: {state['time']}m | Packs: {state['packs']} | Avg: {ppm:.2f} packs/min",
+        f"Type: {hb_type}",
+        f"Opening: {', '.join(rng.sample(PACKS, rng.randint(1, 3)))}",
+    ]
+    if kind == "tradeable":
+        lines.insert(0, "Tradeable cards found")
+    if kind == "god_pack":
+        lines.insert(0, "God Pack found!")
+    return "\n".join(lines)
+
+
+def build_world(bot, member_count, rng):
+    guild = FakeGuild(1, "Arwin")
+    me = FakeMember(999, "ArwinBot", guild, bot=True)
+    guild.me = me
+    webhook_author = FakeMember(998, "Captain Webhook", guild, bot=True)
+
+    monitor_1 = FakeChannel(bot.HEARTBEAT_MONITOR_ID, "💓︱heartbeat-monitor︱0 PPM", guild)
+    monitor_2 = FakeChannel(bot.HEARTBEAT_MONITOR_2_ID, "💓︱heartbeat-monitor2︱0 PPM", guild)
+    checkin = FakeChannel(7, f"🔴︱{bot.CHECKIN_CHANNEL_NAME}︱0", guild)
+    ping = FakeChannel(bot.CHECKIN_PING_ID, "check-in-ping", guild)
+    guild.text_channels.extend([monitor_1, monitor_2, checkin, ping])
+
+    members, homes, states = [], [], []
+    codes = set()
+    for i in range(member_count):
+        member = FakeMember(100_000 + i, f"reroller{i}", guild)
+        guild.add_member(member)
+        home = FakeChannel(500_000 + i, f"home-reroller{i}", guild, members=[me, member])
+        guild.text_channels.append(home)
+        code = f"{rng.randrange(10**15, 10**16)}"
+        codes.add(code)
+        on_list_2 = rng.random() < 0.2
+        bot.USER_STORE.create(str(member.id), {
+            "username": member.name,
+            "friend_code": code,
+            "secondary_code": None,
+            "instances": 6,
+            "prefix": "AB",
+            "status": "offline" if on_list_2 else "online",
+            "secondary_status": "offline",
+            "status_ids2": "online" if on_list_2 else "offline",
+        })
+        bot.HOME_CHANNELS.assign(home.id, member.id)
+        members.append(member)
+        homes.append(home)
+        states.append({"time": 0, "packs": 0, "ppm": rng.uniform(2.0, 4.5), "instances": rng.randint(3, 8)})
+
+    # God pack logs arrive through a webhook in a channel of their own
+    gp_log = FakeChannel(bot.GOD_PACK_LOG_CHANNEL_ID, "home-godpack-log", guild, members=[me, members[0]])
+    guild.text_channels.append(gp_log)
+
+    channels = {c.id: c for c in guild.text_channels}
+    return guild, me, webhook_author, members, homes, states, gp_log, channels, codes
+
+
+def make_stream(rng, members, homes, states, gp_log, cycles, recorded):
+    stream = []
+    if recorded:
+        for i, content in enumerate(recorded):
+            home = homes[i % len(homes)]
+            stream.append((gp_log if "God Pack" in content else home, content))
+        return stream
+    for _ in range(cycles):
+        order = list(range(len(members)))
+        rng.shuffle(order)
+        for i in order:
+            kind = rng.choices([k for k, _ in KINDS], weights=[w for _, w in KINDS])[0]
+            content = make_heartbeat(rng, kind, states[i])
+            stream.append((gp_log if kind == "god_pack" else homes[i], content))
+    return stream
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="arwin-replay-")
+    os.chdir(workdir)
+    for path in ("whitelist.txt", "whitelist2.txt"):
+        with open(path, "w") as f:
+            f.write("\n".join(PACKS))
+    os.environ.pop("GITHUB_TOKEN", None)
+
+    import bot
+    import metrics
+
+    class ReplayGitHub(bot.GitHubSyncEngine):
+        """Diffs staged files like the real engine, but only counts what it would push."""
+
+        def __init__(self, repo_name):
+            super().__init__(repo_name)
+            self.commits = 0
+            self.bytes_pushed = 0
+
+        def read(self, path):
+            with self.lock:
+                return self.pending.get(path, self.cache.get(path))
+
+        def flush(self, message=""):
+            with self.lock:
+                changes = {path: content for path, content in self.pending.items()
+                           if self.remote.get(path) != self._hash(content)}
+                self.pending.clear()
+                for path, content in changes.items():
+                    self.remote[path] = self._hash(content)
+                    self.cache[path] = content
+                    self.bytes_pushed += len(content)
+                if changes:
+                    self.commits += 1
+            return list(changes)
+
+    github = ReplayGitHub(bot.REPO_NAME)
+    bot.GITHUB_SYNC = github
+    bot.GITHUB_TOKEN = "replay"
+    bot.OUTBOUND.min_interval = 0
+
+    rng = random.Random(args.seed)
+    guild, me, webhook_author, members, homes, states, gp_log, channels, codes = build_world(bot, args.members, rng)
+    by_id = {m.id: m for m in members}
+    now = time.monotonic()
+    for url in bot.PUBLIC_IDS_URLS:
+        bot.PUBLIC_IDS.entries[url] = {"ids": frozenset(codes), "etag": None, "last_modified": None, "checked": now + 10**9}
+
+    class ReplayBot(bot.MyBot):
+        @property
+        def user(self):
+            return me
+
+        @property
+        def guilds(self):
+            return [guild]
+
+        def get_channel(self, channel_id):
+            return channels.get(channel_id)
+
+        async def fetch_channel(self, channel_id):
+            return channels[channel_id]
+
+        def get_user(self, user_id):
+            return by_id.get(user_id)
+
+        async def process_heartbeat(self, message, hb):
+            t0 = time.perf_counter()
+            await super().process_heartbeat(message, hb)
+            handling.append(time.perf_counter() - t0)
+
+    client = ReplayBot()
+    client.history_hydrated = False
+
+    recorded = None
+    if args.recorded:
+        with open(args.recorded) as f:
+            recorded = [json.loads(line)["content"] for line in f if line.strip()]
+
+    # Monitor history from "before the restart", for the cold hydration pass
+    for i in range(min(args.history, len(members))):
+        monitor = channels[bot.HEARTBEAT_MONITOR_ID]
+        monitor.messages.append(FakeMessage(monitor, f"{members[i].name}\n{make_heartbeat(rng, '96p', states[i])}", me))
+
+    stream = make_stream(rng, members, homes, states, gp_log, args.cycles, recorded)
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+
+    timings = {}
+    latencies = []
+    handling = []
+    with quiet:
+        start = time.perf_counter()
+        await client.post_aggregated_stats()
+        timings["stats (cold)"] = time.perf_counter() - start
+
+        replay_start = time.perf_counter()
+        for n, (channel, content) in enumerate(stream, 1):
+            message = FakeMessage(channel, content, webhook_author, webhook_id=4242)
+            t0 = time.perf_counter()
+            await client.on_message(message)
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(0) # Let the outbound workers forward
+            if n % args.flush_every == 0:
+                await bot.HEARTBEAT_INGEST.join()
+                await client.flush_user_store()
+                if n % (args.flush_every * args.sync_every) == 0:
+                    await client.auto_github_sync()
+        await bot.HEARTBEAT_INGEST.join()
+        await client.flush_user_store()
+        await client.auto_github_sync()
+        replay_elapsed = time.perf_counter() - replay_start
+        await asyncio.wait_for(asyncio.gather(*(q.join() for q in bot.OUTBOUND.queues.values())), 60)
+
+        start = time.perf_counter()
+        await client.post_aggregated_stats()
+        timings["stats (warm)"] = time.perf_counter() - start
+        for label in ("ppm (cold)", "ppm (warm)"):
+            start = time.perf_counter()
+            await client.update_heartbeat_ppm()
+            timings[label] = time.perf_counter() - start
+
+    for worker in bot.OUTBOUND.workers.values():
+        worker.cancel()
+    for worker in list(bot.HEARTBEAT_INGEST.tasks.values()):
+        worker.cancel()
+    for worker in bot.RENAMES.workers.values():
+        worker.cancel()
+
+    count = len(stream)
+    local_bytes = sum(v for _, v in metrics.STORE_FLUSH_BYTES._values.items())
+    latencies.sort()
+    handling.sort()
+    print(f"members: {len(members)}, messages: {count}, forwards sent: {channels[bot.HEARTBEAT_MONITOR_ID].sent + channels[bot.HEARTBEAT_MONITOR_2_ID].sent}")
+    print(f"throughput: {count / replay_elapsed:,.0f} msg/s (incl. handling and flushes), {bot.HEARTBEAT_INGEST.dropped} dropped")
+    for label, values in (("on_message", latencies), ("handling", handling)):
+        print(f"{label:>10}: p50 {percentile(values, 0.50) * 1e6:,.0f} us  p99 {percentile(values, 0.99) * 1e6:,.0f} us  "
+              f"max {values[-1] * 1e3:,.1f} ms")
+    print(f"written: local {local_bytes / count:,.0f} B/msg ({local_bytes / 1e6:.1f} MB), "
+          f"github {github.bytes_pushed / count:,.0f} B/msg in {github.commits} commits")
+    for label, elapsed in timings.items():
+        print(f"{label:>13}: {elapsed * 1e3:,.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("members", nargs="?", type=int, default=2000)
+    parser.add_argument("cycles", nargs="?", type=int, default=5)
+    parser.add_argument("--recorded", help="JSON Lines file of recorded heartbeats")
+    parser.add_argument("--history", type=int, default=600, help="Monitor messages present before the replay")
+    parser.add_argument("--flush-every", type=int, default=250, help="Messages between store flushes")
+    parser.add_argument("--sync-every", type=int, default=12, help="Store flushes between GitHub syncs")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own output")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
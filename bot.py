@@ -3,22 +3,37 @@ import os
 import asyncio
 from discord.ext import commands, tasks
 from discord import app_commands
-from github import Github, Auth
+from github import Github, Auth, InputGitTreeElement, UnknownObjectException
 import json
 from aiohttp import web
 import aiohttp
 from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 import re
 import io
-from PIL import Image, ImageDraw, ImageFont
+import base64
 import time
+import struct
+import sys
+import hashlib
+import threading
+import logging
+from array import array
+from collections import deque
+from heartbeat import parse_heartbeat, split_forwarded, FORWARD_SEPARATOR
+from watermark import WatermarkPool, WATERMARK_WORKERS, WATERMARK_MAX_PENDING, WATERMARK_FORMAT, WATERMARK_COMPRESSION
+import metrics
 
 # --- CONFIGURATION ---
 TOKEN = os.getenv("DISCORD_TOKEN")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 REPO_NAME = "arwinzbronder-ux/Arwin" # Format: username/repo
+GITHUB_BRANCH = "main"
+GITHUB_POOL_SIZE = 4 # Keep-alive connections to api.github.com
+GITHUB_RATE_LIMIT_RESERVE = 50 # Pause GitHub calls once fewer requests than this remain
 CATEGORY_NAME = "Member Channels"
 DATA_FILE = "users.json"
+SAMPLES_FILE = "samples.bin"
 CHECKIN_CHANNEL_NAME = "check-in"
 WATERMARK_CHANNEL_NAME = "🏆︱live-godpacks-showcase"
 SOURCE_CHANNEL_NAME = "🎰︱group-packs"
@@ -33,22 +48,46 @@ WHITELIST_FILE = "whitelist.txt"
 WHITELIST2_FILE = "whitelist2.txt"
 ROLE_REROLLING = "Rerolling"
 ROLE_NOT_REROLLING = "Not Rerolling"
+USER_STORE_FLUSH_SECONDS = 5 # Coalesce users.json writes into one flush per interval
+SAMPLE_RETENTION_SECONDS = 90000 # 25h (keep buffer for 24h calc)
+WHITELIST_CHECK_SECONDS = 10 # How often heartbeats may stat() the whitelist files for edits
+PUBLIC_IDS_URLS = ("https://arwin.de/ids.txt", "https://arwin.de/ids2.txt")
+PUBLIC_IDS_TTL_SECONDS = 30 # Revalidate the public lists at most once per interval
+PUBLISH_VERIFY_TIMEOUT_SECONDS = 180 # Give arwin.de 3m to show a freshly pushed ID
+OUTBOUND_MIN_INTERVAL = 1.2 # Seconds between bot messages in one channel (Discord allows 5 per 5s)
+FORWARD_BATCHING = os.getenv("FORWARD_BATCHING", "1") == "1" # Join queued heartbeat forwards into one message
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper() # DEBUG adds per-heartbeat tracing
+RENAME_BUDGET = 2 # Discord allows 2 name edits per channel...
+RENAME_WINDOW_SECONDS = 600 # ...every 10 minutes
+ROLE_SWEEP_INTERVAL = 2.0 # Seconds between role edits during a full-guild sweep
+HEARTBEAT_QUEUE_LIMIT = os.getenv("HEARTBEAT_QUEUE_LIMIT", "2000") # Heartbeats waiting across all channels (newer ones are dropped)
+VIP_FILE = "vip_ids.txt"
+PERSONAL_DIR = "users" # users/<personal_file>: vip_ids.txt minus the member's excluded_ids
+VIP_PUBLISH_WINDOW_SECONDS = 30 # VIP IDs detected within this window go out in one commit
+
+# The bot's own logger; discord.py configures the root logger separately in bot.run()
+log = logging.getLogger("arwin")
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+log.addHandler(_log_handler)
+log.propagate = False
+try:
+    log.setLevel(LOG_LEVEL)
+except ValueError:
+    log.setLevel(logging.INFO)
+    log.warning("Unknown LOG_LEVEL %r, using INFO", LOG_LEVEL)
+try:
+    HEARTBEAT_QUEUE_LIMIT = int(HEARTBEAT_QUEUE_LIMIT)
+    if HEARTBEAT_QUEUE_LIMIT < 1: raise ValueError
+except ValueError:
+    log.warning("Invalid HEARTBEAT_QUEUE_LIMIT %r, using 2000", HEARTBEAT_QUEUE_LIMIT)
+    HEARTBEAT_QUEUE_LIMIT = 2000
 
 # --- HELPER FUNCTIONS ---
-LAST_CHANNEL_UPDATE = 0
 GITHUB_SYNC_NEEDED = False
 
 
 
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        return {}
-    try:
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
 def load_whitelist():
     defaults = {"MegaGyarados", "MegaBlaziken", "MegaAltaria", "CrimsonBlaze"}
     if not os.path.exists(WHITELIST_FILE):
@@ -75,39 +114,65 @@ def load_whitelist2():
     except Exception:
         return list(defaults)
 
+class WhitelistRegistry:
+    """In-memory whitelists as frozensets, keyed by list id (1 or 2).
+
+    Heartbeat policing reads from here instead of re-reading the files. The
+    commands replace a set atomically; edits made to the files directly are
+    picked up by an mtime check that runs at most every check_interval seconds.
+    """
+
+    def __init__(self, sources, check_interval):
+        self.sources = sources # list_id -> (path, loader)
+        self.check_interval = check_interval
+        self.sets = {}
+        self.mtimes = {}
+        self.checked = {}
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, list_id):
+        path, loader = self.sources[list_id]
+        now = time.monotonic()
+        if list_id in self.sets and now - self.checked.get(list_id, 0) < self.check_interval:
+            return self.sets[list_id]
+
+        self.checked[list_id] = now
+        mtime = self._mtime(path)
+        if list_id not in self.sets or mtime != self.mtimes.get(list_id):
+            self.sets[list_id] = frozenset(loader())
+            self.mtimes[list_id] = mtime
+        return self.sets[list_id]
+
+    def replace(self, list_id, items):
+        path, _ = self.sources[list_id]
+        self.sets[list_id] = frozenset(items)
+        self.mtimes[list_id] = self._mtime(path)
+        self.checked[list_id] = time.monotonic()
+
+    def validate(self, tokens, list_id):
+        """Return the first token that is not allowed, or None if all are."""
+        allowed = self.get(list_id)
+        for token in tokens:
+            if token not in allowed:
+                return token
+        return None
+
+WHITELISTS = WhitelistRegistry({1: (WHITELIST_FILE, load_whitelist), 2: (WHITELIST2_FILE, load_whitelist2)}, WHITELIST_CHECK_SECONDS)
+
 def _blocking_upload_whitelist(data_list):
-    if not GITHUB_TOKEN: return
     content = "\n".join(sorted(list(set(data_list))))
-    try:
-        auth = Auth.Token(GITHUB_TOKEN)
-        g = Github(auth=auth)
-        repo = g.get_repo(REPO_NAME)
-        try:
-            contents = repo.get_contents(WHITELIST_FILE)
-            repo.update_file(contents.path, "[skip ci] [skip render] Bot: Update whitelist", content, contents.sha)
-        except Exception:
-            repo.create_file(WHITELIST_FILE, "[skip ci] [skip render] Bot: Create whitelist", content)
-        print(f"💾 Saved {WHITELIST_FILE} to GitHub", flush=True)
-    except Exception as e:
-        print(f"❌ Failed to save {WHITELIST_FILE} to GitHub: {e}", flush=True)
+    GITHUB_SYNC.stage(WHITELIST_FILE, content)
+    GITHUB_SYNC.flush("[skip ci] [skip render] Bot: Update whitelist")
 
 def _blocking_upload_whitelist2(data_list):
-    if not GITHUB_TOKEN: return
     content = "\n".join(sorted(list(set(data_list))))
-    try:
-        auth = Auth.Token(GITHUB_TOKEN)
-        g = Github(auth=auth)
-        repo = g.get_repo(REPO_NAME)
-        try:
-            contents = repo.get_contents(WHITELIST2_FILE)
-            repo.update_file(contents.path, "[skip ci] [skip render] Bot: Update Whitelist 2", content, contents.sha)
-            print(f"💾 Saved {WHITELIST2_FILE} to GitHub", flush=True)
-        except Exception:
-            try: repo.create_file(WHITELIST2_FILE, "[skip ci] [skip render] Bot: Create Whitelist 2", content)
-            except: pass 
-            
-    except Exception as e:
-        print(f"❌ Failed to save {WHITELIST2_FILE} to GitHub: {e}", flush=True)
+    GITHUB_SYNC.stage(WHITELIST2_FILE, content)
+    GITHUB_SYNC.flush("[skip ci] [skip render] Bot: Update Whitelist 2")
 
 async def save_whitelist_async(data_list):
     try:
@@ -115,9 +180,10 @@ async def save_whitelist_async(data_list):
             f.write("\n".join(sorted(list(set(data_list)))))
     except Exception as e:
         print(f"Error saving local whitelist: {e}", flush=True)
+    WHITELISTS.replace(1, data_list)
         
     loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, _blocking_upload_whitelist, data_list)
+    await loop.run_in_executor(GITHUB_EXECUTOR, _blocking_upload_whitelist, data_list)
 
 async def save_whitelist2_async(data_list):
     try:
@@ -125,300 +191,397 @@ async def save_whitelist2_async(data_list):
             f.write("\n".join(sorted(list(set(data_list)))))
     except Exception as e:
         print(f"Error saving local whitelist2: {e}", flush=True)
+    WHITELISTS.replace(2, data_list)
         
     loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, _blocking_upload_whitelist2, data_list)
-
-async def manage_roles(member, status):
-    if member.bot: return
-    
-    guild = member.guild
-    role_rerolling = discord.utils.get(guild.roles, name=ROLE_REROLLING)
-    role_not_rerolling = discord.utils.get(guild.roles, name=ROLE_NOT_REROLLING)
-
-    if not role_rerolling:
-        try:
-            role_rerolling = await guild.create_role(name=ROLE_REROLLING, color=discord.Color.green(), hoist=True, permissions=discord.Permissions.none())
-        except: pass
-
-    if not role_not_rerolling:
-        try:
-            role_not_rerolling = await guild.create_role(name=ROLE_NOT_REROLLING, color=discord.Color.red(), hoist=True, permissions=discord.Permissions.none())
-        except: pass
-
-    try:
-        if status == 'online':
-            if role_rerolling: await member.add_roles(role_rerolling)
-            if role_not_rerolling: await member.remove_roles(role_not_rerolling)
-        else:
-            if role_not_rerolling: await member.add_roles(role_not_rerolling)
-            if role_rerolling: await member.remove_roles(role_rerolling)
-            
-    except Exception as e:
-        print(f"Failed to update roles for {member.name}: {e}", flush=True)
-        
-def _blocking_update_vip(new_id):
-    if not GITHUB_TOKEN: return
-    try:
-        auth = Auth.Token(GITHUB_TOKEN)
-        g = Github(auth=auth)
-        repo = g.get_repo(REPO_NAME)
-        
-        ids = set()
-        file_sha = None
-        try:
-            contents = repo.get_contents("vip_ids.txt")
-            file_sha = contents.sha
-            existing_text = contents.decoded_content.decode()
-            ids = set(existing_text.splitlines())
-        except Exception:
-            pass 
-            
-        if new_id not in ids:
-            ids.add(new_id)
-            new_content = "\n".join(sorted(list(ids)))
-            
-            if file_sha:
-                repo.update_file("vip_ids.txt", "[skip ci] [skip render] Bot: Update VIP IDs", new_content, file_sha)
-            else:
-                repo.create_file("vip_ids.txt", "[skip ci] [skip render] Bot: Create VIP IDs", new_content)
-            print(f"💎 Added VIP ID {new_id} to vip_ids.txt", flush=True)
-            
-    except Exception as e:
-        print(f"❌ Failed to update vip_ids.txt: {e}", flush=True)
-
-async def update_vip_list(new_id):
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, _blocking_update_vip, new_id)
+    await loop.run_in_executor(GITHUB_EXECUTOR, _blocking_upload_whitelist2, data_list)
+def is_rerolling(info):
+    """True if any of the user's IDs is online on either list."""
+    return (info.get('status') == 'online' or
+            info.get('secondary_status') == 'online' or
+            info.get('status_ids2') == 'online' or
+            info.get('secondary_status_ids2') == 'online')
 
 def count_online_users(data):
     count = 0
     for info in data.values():
-        if (info.get('status') == 'online' or 
-            info.get('secondary_status') == 'online' or
-            info.get('status_ids2') == 'online' or
-            info.get('secondary_status_ids2') == 'online'):
+        if is_rerolling(info):
             count += 1
     return count
 
-async def is_user_publicly_online(friend_code, secondary_code):
-    urls = ["https://arwin.de/ids.txt", "https://arwin.de/ids2.txt"]
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            for url in urls:
-                try:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            text = await response.text()
-                            ids = set(line.strip() for line in text.splitlines() if line.strip())
-                            
-                            if friend_code and friend_code in ids:
-                                return True
-                            if secondary_code and secondary_code in ids:
-                                return True
-                except Exception: pass
-    except Exception as e:
-        print(f"⚠️ Failed to check public IDs list: {e}", flush=True)
-    return False
+# --- PUBLIC ID LISTS ---
+HTTP_SESSION = None
+
+def get_http_session():
+    """Shared aiohttp session (one connection pool for arwin.de and self-pings)."""
+    global HTTP_SESSION
+    if HTTP_SESSION is None or HTTP_SESSION.closed:
+        HTTP_SESSION = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+    return HTTP_SESSION
+
+async def close_http_session():
+    global HTTP_SESSION
+    if HTTP_SESSION is not None and not HTTP_SESSION.closed:
+        await HTTP_SESSION.close()
+    HTTP_SESSION = None
+
+class PublicIdCache:
+    """Parsed copies of the public ID lists, revalidated with conditional GETs.
+
+    Each URL keeps its last ID set plus ETag/Last-Modified. Within the TTL the
+    cached set is returned as-is; after that one request revalidates it (a 304
+    just refreshes the timestamp) and concurrent callers await that same request.
+    On errors the last known set is served.
+    """
+
+    def __init__(self, urls, ttl):
+        self.urls = tuple(urls)
+        self.ttl = ttl
+        self.entries = {} # url -> {"ids", "etag", "last_modified", "checked"}
+        self._inflight = {}
+
+    async def get(self, url, max_age=None, bust=False):
+        entry = self.entries.get(url)
+        max_age = self.ttl if max_age is None else max_age
+        if entry and time.monotonic() - entry["checked"] < max_age:
+            return entry["ids"]
+
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._revalidate(url, bust))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _t, url=url: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def get_all(self, max_age=None):
+        return await asyncio.gather(*(self.get(url, max_age) for url in self.urls))
+
+    async def _revalidate(self, url, bust):
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        # The CDN in front of arwin.de caches for minutes; a query string gets
+        # past it while the validators still let the origin answer 304.
+        params = {"t": str(int(time.time()))} if bust else None
+        try:
+            async with get_http_session().get(url, headers=headers, params=params) as response:
+                if response.status == 304 and entry:
+                    entry["checked"] = time.monotonic()
+                    return entry["ids"]
+                if response.status == 200:
+                    text = await response.text()
+                    ids = frozenset(line.strip() for line in text.splitlines() if line.strip())
+                    self.entries[url] = {
+                        "ids": ids,
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "checked": time.monotonic(),
+                    }
+                    return ids
+                print(f"⚠️ Public ID list {url} returned {response.status}", flush=True)
+        except Exception as e:
+            print(f"⚠️ Failed to check public IDs list {url}: {e}", flush=True)
+        return entry["ids"] if entry else None
+
+PUBLIC_IDS = PublicIdCache(PUBLIC_IDS_URLS, PUBLIC_IDS_TTL_SECONDS)
+
+class PublishVerifier:
+    """Waits for friend codes to appear on the public lists.
+
+    Commands register (url, code, callback) and return; one background task
+    fetches each list that has waiters once per tick, backing off while nothing
+    shows up, and runs each callback with True once the code is visible or
+    False after the timeout.
+    """
+    MIN_INTERVAL = 5
+    MAX_INTERVAL = 20
+
+    def __init__(self, cache, timeout):
+        self.cache = cache
+        self.timeout = timeout
+        self.pending = {} # url -> [(code, deadline, callback)]
+        self._task = None
+        self._reports = set()
+        self._fresh = False
+
+    def watch(self, url, code, callback):
+        self.pending.setdefault(url, []).append((code, time.monotonic() + self.timeout, callback))
+        self._fresh = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        interval = self.MIN_INTERVAL
+        while self.pending:
+            await asyncio.sleep(interval)
+            found = False
+            for url in list(self.pending):
+                waiting = self.pending.pop(url, [])
+                ids = await self.cache.get(url, max_age=0, bust=True)
+                now = time.monotonic()
+                still = []
+                for code, deadline, callback in waiting:
+                    if ids and code in ids:
+                        found = True
+                        self._report(callback, True)
+                    elif now >= deadline:
+                        self._report(callback, False)
+                    else:
+                        still.append((code, deadline, callback))
+                if still:
+                    self.pending.setdefault(url, []).extend(still)
 
-def get_checkin_channel(guild):
-    for ch in guild.text_channels:
-        if CHECKIN_CHANNEL_NAME in ch.name:
-            return ch
-    return None
+            # Poll quickly while IDs are landing or new check-ins arrive
+            if found or self._fresh:
+                interval = self.MIN_INTERVAL
+            else:
+                interval = min(interval * 1.5, self.MAX_INTERVAL)
+            self._fresh = False
 
-def add_watermark(image_bytes):
-    try:
-        with Image.open(io.BytesIO(image_bytes)) as img:
-            img = img.convert("RGBA")
-            txt_layer = Image.new('RGBA', img.size, (255, 255, 255, 0))
-            draw = ImageDraw.Draw(txt_layer)
-            text = "EternalGP"
-            width, height = img.size
-            font_size = int(height * 0.09) 
-            if font_size < 15: font_size = 15
-            try:
-                 font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
-            except:
-                 font = ImageFont.load_default()
-            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
-            text_width = right - left
-            text_height = bottom - top
-            x = (width - text_width) / 2
-            y = (height - text_height) / 2
-            stroke_width = max(1, int(font_size / 25))
-            draw.text((x, y), text, font=font, fill=(255, 255, 255, 255), stroke_width=stroke_width, stroke_fill=(0, 0, 0, 255))
-            r, g, b, a = txt_layer.split()
-            a = a.point(lambda p: int(p * 0.35))
-            txt_layer = Image.merge('RGBA', (r, g, b, a))
-            combined = Image.alpha_composite(img, txt_layer)
-            output = io.BytesIO()
-            combined.save(output, format="PNG")
-            output.seek(0)
-            return output
-    except Exception as e:
-        print(f"Error processing image: {e}", flush=True)
-        return None
+    def _report(self, callback, verified):
+        task = asyncio.create_task(self._call(callback, verified))
+        self._reports.add(task)
+        task.add_done_callback(self._reports.discard)
 
-    async def on_message(self, message):
-        # 1. VIP ID Extraction
-        if message.channel.name == SOURCE_CHANNEL_NAME:
-            if "Invalid" in message.content:
-                print(f"⚠️ Ignored Invalid Pack message from {message.author}", flush=True)
-                try: await message.delete() 
-                except: pass
-                return
+    async def _call(self, callback, verified):
+        try:
+            await callback(verified)
+        except Exception as e:
+            print(f"Failed to report verification: {e}", flush=True)
+
+PUBLISH_VERIFIER = PublishVerifier(PUBLIC_IDS, PUBLISH_VERIFY_TIMEOUT_SECONDS)
+
+# --- OUTBOUND MESSAGES ---
+class OutboundScheduler:
+    """Per-channel send queues, so handlers never wait on Discord.
+
+    post() queues a message and returns. One worker per channel sends them
+    in order, at most one message per min_interval. The spacing is fixed:
+    discord.py keeps bucket state private, and its own limiter still waits
+    out an exhausted bucket or a 429 on each send. Items posted with batch=True
+    that are waiting together are joined into one message, up to Discord's
+    2000 character limit, with FORWARD_SEPARATOR between them. on_sent
+    callbacks get the message that carried their item.
+    """
+    LIMIT = 2000
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self.queues = {}
+        self.workers = {}
+
+    def post(self, channel, content, batch=False, on_sent=None):
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = asyncio.Queue()
+            self.workers[channel.id] = asyncio.create_task(self._run(channel, queue))
+        queue.put_nowait((content, batch, on_sent))
+
+    async def _run(self, channel, queue):
+        carry = None # Taken from the queue but didn't fit the previous batch
+        while True:
+            first = carry if carry is not None else await queue.get()
+            carry = None
+            items = [first]
+            size = len(first[0])
+            while first[1] and not queue.empty():
+                nxt = queue.get_nowait()
+                if not nxt[1] or size + len(FORWARD_SEPARATOR) + len(nxt[0]) > self.LIMIT:
+                    carry = nxt
+                    break
+                items.append(nxt)
+                size += len(FORWARD_SEPARATOR) + len(nxt[0])
 
-            match = re.search(r'\((\d{16})\)', message.content)
-            if match:
-                vip_id = match.group(1)
-                print(f"🔍 Detected VIP ID: {vip_id}", flush=True)
-                # We still allow auto-add, or should we wait for Alive? 
-                # User didn't specify changing this logic, so we keep auto-add.
-                await update_vip_list(vip_id)
-                
-            # TRIAGE: If Webhook, Repost with Buttons
-            if message.webhook_id:
-                view = PackView()
-                files = []
-                # Repost attachments
-                if message.attachments:
-                    try:
-                        for attachment in message.attachments:
-                            # We must read into BytesIO because we can't reuse the attachment object directly easily
-                            # Actually await attachment.to_file() works
-                            files.append(await attachment.to_file())
-                    except: pass
-                
+            try:
+                sent = await channel.send(FORWARD_SEPARATOR.join(content for content, _, _ in items))
+                metrics.OUTBOUND_SENT.inc(result="sent")
+                for _, _, on_sent in items:
+                    if on_sent:
+                        try: on_sent(sent)
+                        except Exception as e: print(f"Outbound callback failed: {e}", flush=True)
+            except Exception as e:
+                metrics.OUTBOUND_SENT.inc(result="failed")
+                print(f"Failed to send to {channel}: {e}", flush=True)
+            finally:
+                for _ in items:
+                    queue.task_done()
+            await asyncio.sleep(self.min_interval)
+
+    async def drain(self, timeout):
+        """Wait (up to timeout) for queued messages to go out, then stop the workers."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues.values())), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Dropped {sum(q.qsize() for q in self.queues.values())} queued messages on shutdown", flush=True)
+        for worker in self.workers.values():
+            worker.cancel()
+
+    def depth(self):
+        return {(("channel", str(channel_id)),): queue.qsize() for channel_id, queue in self.queues.items()}
+
+OUTBOUND = OutboundScheduler(OUTBOUND_MIN_INTERVAL)
+metrics.OUTBOUND_QUEUE_DEPTH.set_function(OUTBOUND.depth)
+
+# --- HEARTBEAT INGEST ---
+class HeartbeatIngest:
+    """Runs heartbeat handling off the gateway event, in order per home channel.
+
+    on_message only parses and submit()s. Each key (home channel) with work
+    waiting gets its own worker, which handles that key's heartbeats strictly
+    in order and exits once they're done. A slow arwin.de check or GitHub
+    stage therefore only holds up the member it belongs to. Once `limit`
+    heartbeats are waiting new ones are dropped and counted; after drain()
+    they are refused.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.queues = {} # key -> deque of (queued at, handler, args), while its worker runs
+        self.tasks = {}
+        self.pending = 0
+        self.dropped = 0
+        self.refused = 0
+        self.closed = False
+
+    def submit(self, key, handler, *args):
+        """Queue handler(*args) behind earlier work for the same key. False if dropped."""
+        if self.closed:
+            self.refused += 1
+            if self.refused == 1 or self.refused % 100 == 0:
+                print(f"⚠️ Heartbeat arrived after shutdown began; refused {self.refused} so far", flush=True)
+            return False
+        if self.pending >= self.limit:
+            self.dropped += 1
+            metrics.HEARTBEAT_DROPPED.inc()
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                print(f"⚠️ Heartbeat queue full ({self.limit}); dropped {self.dropped} so far", flush=True)
+            return False
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = deque()
+            self.tasks[key] = asyncio.create_task(self._run(key, queue))
+        self.pending += 1
+        queue.append((time.perf_counter(), handler, args))
+        return True
+
+    async def _run(self, key, queue):
+        try:
+            while queue:
+                queued, handler, args = queue.popleft()
+                metrics.HEARTBEAT_QUEUE_SECONDS.observe(time.perf_counter() - queued)
                 try:
-                    await message.channel.send(content=message.content, files=files, view=view)
-                    await message.delete()
+                    await handler(*args)
                 except Exception as e:
-                    print(f"Failed to triage pack: {e}", flush=True)
-                return # Stop processing (we handled it)
-
-        # 2. Smart Heartbeat Routing & Policing
-        # Check if channel is a 'home-' channel AND message is from a webhook
-        if message.channel.name.startswith("home-") and message.webhook_id:
-            print(f"DEBUG: Webhook message detected in {message.channel.name}", flush=True)
+                    print(f"⚠️ Heartbeat worker error: {e}", flush=True)
+                finally:
+                    self.pending -= 1
+        finally:
+            # No await since the last emptiness check, so nothing was queued behind it
+            del self.queues[key]
+            del self.tasks[key]
+
+    async def join(self):
+        """Wait until every queued heartbeat has been handled."""
+        while self.tasks:
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    async def drain(self, timeout):
+        """Stop taking heartbeats, wait (up to timeout) for queued ones to be handled, then stop the workers."""
+        self.closed = True
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Dropped {self.pending} queued heartbeats on shutdown", flush=True)
+        for task in list(self.tasks.values()):
+            task.cancel()
+
+HEARTBEAT_INGEST = HeartbeatIngest(HEARTBEAT_QUEUE_LIMIT)
+metrics.HEARTBEAT_QUEUE_DEPTH.set_function(lambda: HEARTBEAT_INGEST.pending)
+
+# --- CHANNEL RENAMES ---
+class ChannelRenameManager:
+    """Applies channel names within Discord's per-channel edit budget.
+
+    request() records the name a channel should have and returns. If the
+    channel has budget left the rename goes out now; otherwise one retry is
+    scheduled for when the oldest edit leaves the window, and it applies
+    whatever name was requested last. Names requested in between are never
+    sent, and the final one is never dropped.
+    """
+
+    def __init__(self, budget, window):
+        self.budget = budget
+        self.window = window
+        self.edits = {}    # channel_id -> deque of monotonic edit times
+        self.desired = {}  # channel_id -> (channel, name)
+        self.applied = {}  # channel_id -> last name we set
+        self.workers = {}
+
+    def _wait(self, channel_id):
+        edits = self.edits.get(channel_id)
+        if not edits:
+            return 0
+        now = time.monotonic()
+        while edits and now - edits[0] >= self.window:
+            edits.popleft()
+        if len(edits) < self.budget:
+            return 0
+        return self.window - (now - edits[0])
+
+    def request(self, channel, name):
+        """Queue a rename; returns roughly how many seconds until it applies."""
+        if name == self.applied.get(channel.id, channel.name) and channel.id not in self.desired:
+            return 0
+        self.desired[channel.id] = (channel, name)
+        worker = self.workers.get(channel.id)
+        if worker is None or worker.done():
+            self.workers[channel.id] = asyncio.create_task(self._run(channel.id))
+        return self._wait(channel.id)
+
+    async def _run(self, channel_id):
+        while channel_id in self.desired:
+            wait = self._wait(channel_id)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            channel, name = self.desired.pop(channel_id)
+            if name == self.applied.get(channel_id, channel.name):
+                continue
+            self.edits.setdefault(channel_id, deque()).append(time.monotonic())
             try:
-                # Identify Member from Channel Name (home-username) - Case Insensitive
-                username_part = message.channel.name[5:].lower() # "home-" is 5 chars
-                member = None
-                for m in message.guild.members:
-                    if m.name.lower() == username_part:
-                        member = m
-                        break
-                
-                print(f"DEBUG: Resolved Member: {member} (from '{username_part}')", flush=True)
-
-                user_id = str(member.id) if member else None
-                data = load_data()
-                
-                in_db = user_id in data if user_id else False
-                print(f"DEBUG: User ID: {user_id} | In DB: {in_db}", flush=True)
-                
-                if user_id and user_id in data:
-                    print("DEBUG: Processing Heartbeat...", flush=True)
-                    content = message.content
-                    reason = None
-                    # ... (rest of logic)
-                    content = message.content
-                    reason = None
-                    
-                    # --- RULE 2: "1P Method" ---
-                    if "1P Method" in content:
-                        reason = "Forbidden Strategy: 1P Method detected."
-
-                    # --- PARSING ---
-                    # Time: 120m Packs: 414
-                    # Opening: CrimsonBlaze,
-                    time_match = re.search(r"Time:\s*(\d+)m\s*Packs:\s*(\d+)", content)
-                    opening_match = re.search(r"Opening:\s*(.+)", content) # Capture rest of line
-                    
-                    current_time = int(time_match.group(1)) if time_match else 0
-                    current_packs = int(time_match.group(2)) if time_match else 0
-                    
-                    # --- RULE 1: Stalling (Time +30m, Packs same) ---
-                    if time_match:
-                        last_stats = data[user_id].get('last_heartbeat', {})
-                        last_time = last_stats.get('time', 0)
-                        last_packs = last_stats.get('packs', 0)
-                        
-                        # Check: New Time is roughly ~30m more (allow >= 25) AND Packs are identical
-                        # Only check if we actually have history (last_time > 0)
-                        if last_time > 0 and (current_time - last_time) >= 25 and current_packs == last_packs:
-                            reason = f"Stalling Detected: Time passed ({current_time - last_time}m) but Packs ({current_packs}) did not increase."
-                            
-                    # --- RULE 3: Wrong Pack Type ---
-                    if not reason and opening_match:
-                        opening_str = opening_match.group(1).replace(",", " ").strip()
-                        
-                        allowed_packs = set(load_whitelist())
-                        
-                        # Split by space and check each word (ignoring empty strings)
-                        found_words = [w for w in opening_str.split() if w]
-                        for word in found_words:
-                            if word not in allowed_packs:
-                                reason = f"Forbidden Pack: '{word}' is not allowed."
-                                break
-
-                    if reason:
-                        # BAN HAMMER
-                        print(f"🚫 POLICING BAN: {member.name} - {reason}", flush=True)
-                        
-                        # 1. Update Data (Offline)
-                        data[user_id]['status'] = 'offline'
-                        data[user_id]['secondary_status'] = 'offline' 
-                        # Clear heartbeat history on ban so they can reset
-                        if 'last_heartbeat' in data[user_id]: del data[user_id]['last_heartbeat']
-                        
-                        await save_data_async(data)
-                        await sync_to_github(data)
-                        
-                        # 2. Roles
-                        await manage_roles(member, 'offline')
-                        await update_channel_status(self) # Update check-in count
-                        
-                        # 3. Ping in Check-in
-                        try:
-                            checkin_ping_channel = await self.fetch_channel(CHECKIN_PING_ID)
-                            await checkin_ping_channel.send(
-                                f"🚨 {member.mention} **has been automatically taken offline.**\n"
-                                f"**Reason:** {reason}\n"
-                                f"Please adjust your settings before checking in again."
-                            )
-                        except Exception as e:
-                            print(f"Failed to ping ban in check-in: {e}", flush=True)
-                        
-                        # Continue to forward for transparency
-
-                    else:
-                        # ALL GOOD - Update History
-                        if time_match:
-                            data[user_id]['last_heartbeat'] = {'time': current_time, 'packs': current_packs}
-                            await save_data_async(data)
-                        
-                    # ALWAYS Forward to Heartbeat Channel (Transparency)
-                    try:
-                        hb_channel = await self.fetch_channel(HEARTBEAT_MONITOR_ID)
-                        # Replicate Format: MemberName\nContent
-                        forward_msg = f"{member.name}\n{content}"
-                        await hb_channel.send(forward_msg)
-                    except Exception as e:
-                            print(f"Failed to forward heartbeat: {e}", flush=True)
-
+                await channel.edit(name=name)
+                self.applied[channel_id] = name
+                print(f"🔄 Renamed channel to: {name}", flush=True)
+            except discord.NotFound:
+                print(f"⚠️ Rename target {channel_id} is gone", flush=True)
+                return
             except Exception as e:
-                print(f"⚠️ Heartbeat Policing Error: {e}", flush=True)
+                print(f"⚠️ Channel rename to {name} failed: {e}", flush=True)
+                # Retry with the next free slot unless a newer name replaced it
+                self.desired.setdefault(channel_id, (channel, name))
 
+RENAMES = ChannelRenameManager(RENAME_BUDGET, RENAME_WINDOW_SECONDS)
 
-        # ... (Existing Check for self.user to prevent loops) ...
-        if message.author == self.user:
-            return
+async def is_user_publicly_online(friend_code, secondary_code):
+    for ids in await PUBLIC_IDS.get_all():
+        if not ids:
+            continue
+        if friend_code and friend_code in ids:
+            return True
+        if secondary_code and secondary_code in ids:
+            return True
+    return False
 
-        # 2. Watermarking
-        # ...
+def get_checkin_channel(guild):
+    for ch in guild.text_channels:
+        if CHECKIN_CHANNEL_NAME in ch.name:
+            return ch
+    return None
 
 def load_data():
     if not os.path.exists(DATA_FILE):
@@ -433,44 +596,777 @@ def load_data():
     except Exception:
         return {"_global_stats": {"daily_god_packs": 0, "last_reset_day": datetime.now(timezone.utc).strftime("%Y-%m-%d")}}
 
-async def manage_roles(member, status):
-    if member.bot: return
+# --- USER STORE ---
+
+def _serialize_users(data):
+    return json.dumps(data, separators=(",", ":"))
+
+def _blocking_write_atomic(path, payload):
+    """Atomically replace path with payload (temp file + rename)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(payload)
+
+def _blocking_write_json(path, data):
+    return _blocking_write_atomic(path, _serialize_users(data).encode())
+
+class PublishedIds:
+    """Codes one public list (ids.txt / ids2.txt) should contain; render() is cached per version."""
+
+    def __init__(self):
+        self.counts = {} # code -> number of online slots publishing it
+        self.version = 0
+        self._body = ""
+        self._body_version = 0
+
+    def __contains__(self, code):
+        return code in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, code):
+        count = self.counts.get(code, 0)
+        self.counts[code] = count + 1
+        if not count:
+            self.version += 1
+
+    def remove(self, code):
+        count = self.counts.get(code, 0)
+        if count > 1:
+            self.counts[code] = count - 1
+        elif count:
+            del self.counts[code]
+            self.version += 1
+
+    def render(self):
+        if self._body_version != self.version:
+            self._body = "\n".join(sorted(self.counts))
+            self._body_version = self.version
+        return self._body
+
+class FriendCodeTaken(ValueError):
+    """A friend code is already registered to another user."""
+
+    def __init__(self, code, owner_id):
+        super().__init__(f"Friend code {code} is already registered to {owner_id}")
+        self.code = code
+        self.owner_id = owner_id
+
+class UserStore:
+    """users.json held in memory and flushed in the background; "_" keys hold global state.
+    Mutations keep the friend code index (FriendCodeTaken on a duplicate) and `published` current."""
+    CODE_FIELDS = ("friend_code", "secondary_code")
+    # list id -> (code field, status field) pairs that put a code on that list
+    LIST_FIELDS = {
+        1: (("friend_code", "status"), ("secondary_code", "secondary_status")), # ids.txt
+        2: (("friend_code", "status_ids2"), ("secondary_code", "secondary_status_ids2")), # ids2.txt
+    }
+    TRACKED_FIELDS = frozenset(field for pairs in LIST_FIELDS.values() for pair in pairs for field in pair)
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        self.codes = {} # friend code -> user_id
+        self.published = {list_id: PublishedIds() for list_id in self.LIST_FIELDS}
+        self.loaded = False
+        self.dirty = False
+        self._flush_lock = asyncio.Lock()
+
+    def load(self):
+        self.data = load_data()
+        self.codes = {}
+        self.published = {list_id: PublishedIds() for list_id in self.LIST_FIELDS}
+        for user_id, info in self.users():
+            for code in self._codes_of(info):
+                owner = self.codes.setdefault(code, user_id)
+                if owner != user_id:
+                    print(f"⚠️ Friend code {code} registered to both {owner} and {user_id} (keeping {owner})", flush=True)
+            self._republish(None, info)
+        self.loaded = True
+        self.dirty = False
+        print(f"📂 Loaded {len(self.data)} records from {self.path}", flush=True)
+
+    @classmethod
+    def _codes_of(cls, record):
+        return [record[field] for field in cls.CODE_FIELDS if record.get(field)]
+
+    def code_owner(self, code):
+        """user_id that registered this friend code (either slot), or None."""
+        return self.codes.get(code)
+
+    @classmethod
+    def published_codes(cls, record, list_id):
+        """Codes this record puts on a list."""
+        return [record[code] for code, status in cls.LIST_FIELDS[list_id]
+                if record.get(code) and record.get(status) == 'online']
+
+    def _republish(self, old, new):
+        for list_id, ids in self.published.items():
+            before = self.published_codes(old, list_id) if old else []
+            after = self.published_codes(new, list_id) if new else []
+            if before == after:
+                continue
+            for code in after:
+                ids.add(code)
+            for code in before:
+                ids.remove(code)
+
+    def _changed(self, user_id, old, new):
+        """Keep the code index and published lists in step with a record change."""
+        if user_id.startswith("_"):
+            return
+        self._reindex(user_id, old, new)
+        self._republish(old, new)
+
+    def _reindex(self, user_id, old, new):
+        """Move user_id's index entries from record old to record new (either may be None)."""
+        old_codes = self._codes_of(old) if old else []
+        new_codes = self._codes_of(new) if new else []
+        added = [code for code in new_codes if code not in old_codes]
+        for code in added:
+            owner = self.codes.get(code)
+            if owner is not None and owner != user_id:
+                raise FriendCodeTaken(code, owner)
+        for code in old_codes:
+            if code not in new_codes and self.codes.get(code) == user_id:
+                del self.codes[code]
+        for code in added:
+            self.codes[code] = user_id
+
+    def __contains__(self, user_id):
+        return user_id in self.data
+
+    def get(self, user_id, default=None):
+        """Return the live record for user_id. Treat it as read-only."""
+        return self.data.get(user_id, default)
+
+    def users(self):
+        """Yield (user_id, record) for every user, skipping "_" meta keys."""
+        for user_id, info in list(self.data.items()):
+            if not user_id.startswith("_"):
+                yield user_id, info
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def create(self, user_id, record):
+        self._changed(user_id, self.data.get(user_id), record)
+        self.data[user_id] = record
+        self.mark_dirty()
+        return record
+
+    def update(self, user_id, **fields):
+        """Set fields on a record, creating an empty one if needed."""
+        old = self.data.get(user_id, {})
+        record = {**old, **fields}
+        if not self.TRACKED_FIELDS.isdisjoint(fields):
+            self._changed(user_id, old, record)
+        self.data[user_id] = record
+        self.mark_dirty()
+        return record
+
+    def discard(self, user_id, *keys):
+        """Remove keys from a record if present."""
+        record = self.data.get(user_id)
+        if record and any(key in record for key in keys):
+            new = {k: v for k, v in record.items() if k not in keys}
+            self._changed(user_id, record, new)
+            self.data[user_id] = new
+            self.mark_dirty()
+
+    def delete(self, user_id):
+        record = self.data.pop(user_id, None)
+        if record is not None:
+            self._changed(user_id, record, None)
+            self.mark_dirty()
+        return record
+
+    @property
+    def global_stats(self):
+        return self.data.get("_global_stats", {"daily_god_packs": 0, "last_reset_day": datetime.now(timezone.utc).strftime("%Y-%m-%d")})
+
+    def snapshot(self):
+        return dict(self.data)
+
+    async def flush(self):
+        """Write users.json if anything changed since the last flush."""
+        async with self._flush_lock:
+            if not self.dirty:
+                return 0
+            self.dirty = False
+            snapshot = self.snapshot()
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            try:
+                written = await loop.run_in_executor(None, _blocking_write_json, self.path, snapshot)
+            except Exception as e:
+                self.dirty = True
+                print(f"❌ Failed to write {self.path}: {e}", flush=True)
+                return 0
+            metrics.STORE_FLUSH_SECONDS.observe(time.perf_counter() - start, file=os.path.basename(self.path))
+            metrics.STORE_FLUSH_BYTES.inc(written, file=os.path.basename(self.path))
+            # users.json changed -> let auto_github_sync push it with the ID lists
+            await sync_to_github()
+            return written
+
+USER_STORE = UserStore(DATA_FILE)
+
+# --- HOME CHANNELS ---
+HOME_ADMIN_NAME = "bk030" # Has access to every home channel; never its owner unless alone
+
+def resolve_home_owner(channel):
+    """Work out who owns a home-* channel from who can see it."""
+    # Filter out Bots
+    humans = [m for m in channel.members if not m.bot]
     
-    guild = member.guild
-    role_rerolling = discord.utils.get(guild.roles, name=ROLE_REROLLING)
-    role_not_rerolling = discord.utils.get(guild.roles, name=ROLE_NOT_REROLLING)
+    # Filter out Admin "bk030" (unless they are the ONLY human)
+    candidates = [m for m in humans if m.name != HOME_ADMIN_NAME]
+    
+    if len(candidates) == 1:
+        return candidates[0]
+    if len(candidates) == 0 and len(humans) > 0:
+        # If candidates is empty but humans exist, it must be bk030 alone
+        return humans[0]
+    # Multiple candidates? Log it.
+    if len(candidates) > 1:
+        print(f"⚠️ Ambiguous Members in {channel.name}: {[m.name for m in candidates]}", flush=True)
+    return None
+
+class HomeChannelIndex:
+    """channel_id -> user_id for home-* channels, persisted as "_home_channels".
+
+    Filled when home channels are created, backfilled from channel members on
+    startup and kept current from channel/member events, so attributing a
+    heartbeat is one dict lookup.
+    """
+    KEY = "_home_channels"
+
+    def __init__(self, store):
+        self.store = store
+
+    @property
+    def channels(self):
+        return self.store.get(self.KEY, {})
+
+    def owner_id(self, channel_id):
+        return self.channels.get(str(channel_id))
+
+    def owner(self, channel):
+        """Return the owning member, falling back to channel membership."""
+        user_id = self.owner_id(channel.id)
+        if user_id:
+            member = channel.guild.get_member(int(user_id))
+            if member:
+                return member
+        member = resolve_home_owner(channel)
+        if member:
+            self.assign(channel.id, member.id)
+        return member
+
+    def assign(self, channel_id, user_id):
+        channel_id, user_id = str(channel_id), str(user_id)
+        if self.channels.get(channel_id) != user_id:
+            self.store.update(self.KEY, **{channel_id: user_id})
+
+    def forget_channel(self, channel_id):
+        self.store.discard(self.KEY, str(channel_id))
+
+    def forget_user(self, user_id):
+        user_id = str(user_id)
+        stale = [cid for cid, uid in self.channels.items() if uid == user_id]
+        if stale:
+            self.store.discard(self.KEY, *stale)
+
+    def backfill(self, guilds):
+        """Index home channels that are missing and drop ones that no longer exist."""
+        known = self.channels
+        existing = set()
+        added = 0
+        for guild in guilds:
+            for channel in guild.text_channels:
+                if not channel.name.startswith("home-"):
+                    continue
+                existing.add(str(channel.id))
+                if str(channel.id) in known:
+                    continue
+                member = resolve_home_owner(channel)
+                if member:
+                    self.assign(channel.id, member.id)
+                    added += 1
+
+        gone = [cid for cid in known if cid not in existing]
+        if gone:
+            self.store.discard(self.KEY, *gone)
+        if added or gone:
+            print(f"🏠 Home channel index: +{added} / -{len(gone)}", flush=True)
+
+HOME_CHANNELS = HomeChannelIndex(USER_STORE)
+
+# --- HISTORY CURSORS ---
+class HistoryCursors:
+    """Last processed message id per channel, persisted as "_history_cursors".
+
+    Loops that read channel history ask fetch_new() for what arrived since
+    their last pass instead of paging the same window again. Messages the bot
+    posts itself are recorded with advance() when they are sent.
+    """
+    KEY = "_history_cursors"
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, channel_id):
+        return self.store.get(self.KEY, {}).get(str(channel_id))
+
+    def advance(self, channel_id, message_id):
+        current = self.get(channel_id)
+        if current is None or message_id > current:
+            self.store.update(self.KEY, **{str(channel_id): message_id})
+
+    async def fetch_new(self, channel, first_limit=None):
+        """Yield messages newer than the cursor, oldest first, advancing it as they are handled.
+
+        Without a cursor the scan starts from the newest first_limit messages.
+        """
+        cursor = self.get(channel.id)
+        if cursor is None:
+            recent = [msg async for msg in channel.history(limit=first_limit)]
+            self._count(channel.id, len(recent))
+            recent.reverse()
+            for msg in recent:
+                yield msg
+                self.advance(channel.id, msg.id)
+            return
 
-    # Auto-Create Roles if Missing (Permissions.none() ensures no unexpected rights)
-    if not role_rerolling:
+        read = 0
         try:
-            role_rerolling = await guild.create_role(name=ROLE_REROLLING, color=discord.Color.green(), hoist=True, permissions=discord.Permissions.none())
-            print(f"Created role: {ROLE_REROLLING}", flush=True)
-        except Exception as e:
-            print(f"Failed to create role {ROLE_REROLLING}: {e}", flush=True)
+            async for msg in channel.history(limit=None, after=discord.Object(id=cursor), oldest_first=True):
+                read += 1
+                yield msg
+                self.advance(channel.id, msg.id)
+        finally:
+            self._count(channel.id, read)
+
+    @staticmethod
+    def _count(channel_id, read):
+        # discord.py pages history 100 messages per request; a short or empty page ends the scan
+        metrics.HISTORY_PAGES.inc(read // 100 + 1, channel=str(channel_id))
+        metrics.HISTORY_MESSAGES.inc(read, channel=str(channel_id))
+
+HISTORY_CURSORS = HistoryCursors(USER_STORE)
+
+class HeartbeatFeed:
+    """Latest reported PPM per member in each heartbeat monitor channel.
+
+    Filled when on_message forwards a heartbeat, so update_heartbeat_ppm can
+    sum it without paging channel history. A channel's feed is warmed from
+    its last WINDOW of history once after startup.
+    """
+    WINDOW = 40 * 60 # 30 min heartbeat + 10 min buffer
+
+    def __init__(self):
+        self.channels = {} # channel_id -> {member_name: (ts, ppm)}
+        self.warmed = set()
+
+    def record(self, channel_id, name, hb, ts):
+        # Only Wonderpick 96P+ bots count towards the channel PPM
+        if not hb.is_96p or hb.avg_ppm is None:
+            return
+        members = self.channels.setdefault(channel_id, {})
+        previous = members.get(name)
+        if previous is None or ts >= previous[0]:
+            members[name] = (ts, hb.avg_ppm)
+
+    async def warm(self, channel):
+        if channel.id in self.warmed:
+            return
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.WINDOW)
+        async for message in channel.history(limit=100, after=cutoff):
+            if not message.content: continue
+            for hb in split_forwarded(message.content):
+                self.record(channel.id, hb.name, hb, message.created_at.timestamp())
+        self.warmed.add(channel.id)
+
+    def total_ppm(self, channel_id, now=None):
+        cutoff = (now if now is not None else time.time()) - self.WINDOW
+        members = self.channels.get(channel_id, {})
+        for name in [n for n, (ts, _) in members.items() if ts < cutoff]:
+            del members[name]
+        return sum(ppm for _, ppm in members.values())
+
+HEARTBEAT_FEED = HeartbeatFeed()
+
+def online_lists(info):
+    """ID lists (1 = ids.txt, 2 = ids2.txt) a user record is currently online on."""
+    lists = []
+    if info.get('status') == 'online' or info.get('secondary_status') == 'online':
+        lists.append(1)
+    if info.get('status_ids2') == 'online' or info.get('secondary_status_ids2') == 'online':
+        lists.append(2)
+    return lists
+
+class DailyLiveGps:
+    """Live god packs triaged today (UTC) per user, persisted as "_live_gps".
+
+    PackView.handle_triage records each pack marked Alive, so the stats
+    reports read exact counts instead of scanning the live-packs channel.
+    Counts start over with the first read or write after UTC midnight.
+    """
+    KEY = "_live_gps"
+
+    def __init__(self, store):
+        self.store = store
+
+    def today(self):
+        state = self.store.get(self.KEY, {})
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        if state.get("day") != day:
+            return {"day": day, "users": {}}
+        return {"day": day, "users": state.get("users", {})}
+
+    def record(self, user_id):
+        state = self.today()
+        user_id = str(user_id)
+        users = {**state["users"], user_id: state["users"].get(user_id, 0) + 1}
+        self.store.create(self.KEY, {"day": state["day"], "users": users})
+
+    def for_user(self, user_id):
+        return self.today()["users"].get(str(user_id), 0)
+
+LIVE_GPS = DailyLiveGps(USER_STORE)
+
+# --- PACK SAMPLES ---
+
+class SampleSeries:
+    """One user's (timestamp, packs) history as a flat array of uint32 pairs.
+
+    Appends are O(1). Expired pairs are skipped by moving `head` forward and
+    only physically dropped once they make up most of the buffer.
+    """
+    __slots__ = ("values", "head")
+
+    def __init__(self, values=None):
+        self.values = values if values is not None else array("I")
+        self.head = 0
+
+    def __len__(self):
+        return (len(self.values) - self.head) // 2
+
+    def __iter__(self):
+        values = self.values
+        for i in range(self.head, len(values), 2):
+            yield values[i], values[i + 1]
+
+    def last(self):
+        if len(self) == 0:
+            return None
+        return self.values[-2], self.values[-1]
+
+    def append(self, ts, packs):
+        self.values.append(ts)
+        self.values.append(packs)
+
+    def evict_before(self, cutoff):
+        values, head = self.values, self.head
+        end = len(values)
+        while head < end and values[head] < cutoff:
+            head += 2
+        if head and head * 2 >= end:
+            del values[:head]
+            head = 0
+        self.head = head
+
+    def to_bytes(self):
+        live = self.values[self.head:]
+        if sys.byteorder != "little":
+            live.byteswap()
+        return live.tobytes()
+
+class RollingPackCounter:
+    """Rolling 24h pack total for one user, updated per heartbeat.
+
+    Each new sample contributes its reset-aware delta to the previous sample
+    (packs - last, or packs itself when the counter went down after a
+    restart) into a time bucket. Expired buckets are evicted as time moves
+    on, so reading the total never rescans history.
+    """
+    __slots__ = ("buckets", "running", "last_ts", "last_packs")
+
+    WINDOW = 86400
+    BUCKET = 300
 
-    if not role_not_rerolling:
+    def __init__(self):
+        self.buckets = deque() # [[bucket_start, packs], ...] oldest first
+        self.running = 0
+        self.last_ts = None
+        self.last_packs = None
+
+    @classmethod
+    def from_series(cls, series):
+        counter = cls()
+        for ts, packs in series:
+            counter.add(ts, packs)
+        return counter
+
+    def add(self, ts, packs):
+        if self.last_packs is not None:
+            delta = packs - self.last_packs
+            if delta < 0: delta = packs # Counter reset (Restart) -> assume start from 0
+            if delta:
+                start = ts - ts % self.BUCKET
+                if self.buckets and self.buckets[-1][0] == start:
+                    self.buckets[-1][1] += delta
+                else:
+                    self.buckets.append([start, delta])
+                self.running += delta
+        self.last_ts = ts
+        self.last_packs = packs
+        self.evict(ts)
+
+    def evict(self, now):
+        cutoff = now - self.WINDOW
+        buckets = self.buckets
+        while buckets and buckets[0][0] + self.BUCKET <= cutoff:
+            self.running -= buckets.popleft()[1]
+
+    def total(self, now):
+        self.evict(now)
+        return self.running
+
+class PackSampleStore:
+    """Heartbeat pack samples, kept apart from the profile data in users.json.
+
+    Persisted to SAMPLES_FILE as fixed-width little-endian records:
+    b"PKS1", then per user a (<QI) header of user_id and pair count followed
+    by count (<II) pairs of timestamp and packs.
+    """
+    MAGIC = b"PKS1"
+    HEADER = struct.Struct("<QI")
+
+    def __init__(self, path, retention=SAMPLE_RETENTION_SECONDS):
+        self.path = path
+        self.retention = retention
+        self.series = {}
+        self.counters = {}
+        self.dirty = False
+        self._flush_lock = asyncio.Lock()
+
+    def load(self):
+        self.series = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    self.series = self._decode(f.read())
+            except Exception as e:
+                print(f"⚠️ Could not read {self.path}: {e}", flush=True)
+        self.dirty = False
+        self.prune()
+        self.counters = {user_id: RollingPackCounter.from_series(series) for user_id, series in self.series.items()}
+        print(f"📂 Loaded pack samples for {len(self.series)} users from {self.path}", flush=True)
+
+    def _decode(self, payload):
+        if payload[:4] != self.MAGIC:
+            raise ValueError("bad sample file header")
+        series = {}
+        offset = 4
+        while offset < len(payload):
+            user_id, count = self.HEADER.unpack_from(payload, offset)
+            offset += self.HEADER.size
+            values = array("I")
+            values.frombytes(payload[offset:offset + count * 8])
+            if sys.byteorder != "little":
+                values.byteswap()
+            offset += count * 8
+            series[str(user_id)] = SampleSeries(values)
+        return series
+
+    def adopt_legacy(self, store):
+        """Move [ts, packs] lists still embedded in users.json records into the store."""
+        moved = 0
+        for user_id, info in store.users():
+            samples = info.get("samples")
+            if samples is None:
+                continue
+            self.merge(user_id, samples)
+            store.discard(user_id, "samples")
+            moved += len(samples)
+        if moved:
+            print(f"📦 Moved {moved} legacy samples out of {store.path}", flush=True)
+
+    def get(self, user_id):
+        return self.series.get(user_id)
+
+    def append(self, user_id, ts, packs):
+        ts = int(ts)
+        series = self.series.get(user_id)
+        if series is None:
+            series = self.series[user_id] = SampleSeries()
+        last = series.last()
+        if last is not None and ts < last[0]:
+            # Out of order (e.g. backfill) -> keep the series sorted
+            self.merge(user_id, [(ts, packs)])
+            return
+        series.append(ts, packs)
+        series.evict_before(ts - self.retention)
+        counter = self.counters.get(user_id)
+        if counter is None:
+            counter = self.counters[user_id] = RollingPackCounter()
+        counter.add(ts, packs)
+        self.dirty = True
+
+    def merge(self, user_id, samples):
+        """Insert samples that may be older than what we have, deduplicating by timestamp."""
+        series = self.series.get(user_id)
+        pairs = dict(series) if series is not None else {}
+        for ts, packs in samples:
+            pairs[int(ts)] = int(packs)
+        merged = SampleSeries()
+        for ts in sorted(pairs):
+            merged.append(ts, pairs[ts])
+        merged.evict_before(int(time.time()) - self.retention)
+        self.series[user_id] = merged
+        self.counters[user_id] = RollingPackCounter.from_series(merged)
+        self.dirty = True
+
+    def window(self, user_id, cutoff):
+        """Return [(ts, packs), ...] newer than cutoff, oldest first."""
+        series = self.series.get(user_id)
+        if series is None:
+            return []
+        return [pair for pair in series if pair[0] > cutoff]
+
+    def total_24h(self, user_id, now=None):
+        """Packs opened in the last 24h (sum of positive deltas, resets count from 0)."""
+        counter = self.counters.get(user_id)
+        if counter is None:
+            return 0
+        return counter.total(int(now if now is not None else time.time()))
+
+    def prune(self, now=None):
+        cutoff = int(now if now is not None else time.time()) - self.retention
+        for user_id, series in list(self.series.items()):
+            before = len(series)
+            series.evict_before(cutoff)
+            if len(series) == 0:
+                del self.series[user_id]
+                self.counters.pop(user_id, None)
+            if len(series) != before:
+                self.dirty = True
+
+    def discard(self, user_id):
+        self.counters.pop(user_id, None)
+        if self.series.pop(user_id, None) is not None:
+            self.dirty = True
+
+    def encode(self):
+        chunks = [self.MAGIC]
+        for user_id, series in self.series.items():
+            if not user_id.isdigit() or len(series) == 0:
+                continue
+            chunks.append(self.HEADER.pack(int(user_id), len(series)))
+            chunks.append(series.to_bytes())
+        return b"".join(chunks)
+
+    async def flush(self):
+        async with self._flush_lock:
+            self.prune()
+            if not self.dirty:
+                return 0
+            self.dirty = False
+            payload = self.encode()
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            try:
+                written = await loop.run_in_executor(None, _blocking_write_atomic, self.path, payload)
+            except Exception as e:
+                self.dirty = True
+                print(f"❌ Failed to write {self.path}: {e}", flush=True)
+                return 0
+            metrics.STORE_FLUSH_SECONDS.observe(time.perf_counter() - start, file=os.path.basename(self.path))
+            metrics.STORE_FLUSH_BYTES.inc(written, file=os.path.basename(self.path))
+            await sync_to_github()
+            return written
+
+PACK_SAMPLES = PackSampleStore(SAMPLES_FILE)
+
+# --- ROLES ---
+class RoleReconciler:
+    """Keeps each member's Rerolling / Not Rerolling role in line with the store.
+
+    The two role objects are looked up (and created if missing) once per
+    guild, under a per-guild lock so concurrent calls don't create them
+    twice. reconcile() adds or removes only the status roles that differ,
+    leaving the member's other roles alone, so repeated calls for the same
+    state cost no requests. sweep() reconciles a whole guild, spacing out
+    the edits it has to make.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.roles = {} # guild_id -> (rerolling, not_rerolling)
+        self._locks = {} # guild_id -> asyncio.Lock held while looking up / creating the roles
+
+    async def _role(self, guild, cached, name, color):
+        if cached is not None and guild.get_role(cached.id) is not None:
+            return cached
+        role = discord.utils.get(guild.roles, name=name)
+        if role is None:
+            # Permissions.none() ensures no unexpected rights
+            try:
+                role = await guild.create_role(name=name, color=color, hoist=True, permissions=discord.Permissions.none())
+                print(f"Created role: {name}", flush=True)
+            except Exception as e:
+                print(f"Failed to create role {name}: {e}", flush=True)
+        return role
+
+    async def guild_roles(self, guild):
+        async with self._locks.setdefault(guild.id, asyncio.Lock()):
+            rerolling, not_rerolling = self.roles.get(guild.id, (None, None))
+            rerolling = await self._role(guild, rerolling, ROLE_REROLLING, discord.Color.green())
+            not_rerolling = await self._role(guild, not_rerolling, ROLE_NOT_REROLLING, discord.Color.red())
+            self.roles[guild.id] = (rerolling, not_rerolling)
+            return rerolling, not_rerolling
+
+    def changes(self, member, rerolling, not_rerolling):
+        """(roles to add, roles to remove) to set the member's status role from the store."""
+        online = is_rerolling(self.store.get(str(member.id), {}))
+        wanted = rerolling if online else not_rerolling
+        unwanted = not_rerolling if online else rerolling
+        add = [wanted] if wanted is not None and wanted not in member.roles else []
+        remove = [unwanted] if unwanted is not None and unwanted in member.roles else []
+        return add, remove
+
+    async def reconcile(self, member):
+        """Bring the member's status role in line; True if an edit was sent."""
+        if member.bot: return False
+        rerolling, not_rerolling = await self.guild_roles(member.guild)
+        add, remove = self.changes(member, rerolling, not_rerolling)
+        if not add and not remove:
+            return False
         try:
-            role_not_rerolling = await guild.create_role(name=ROLE_NOT_REROLLING, color=discord.Color.red(), hoist=True, permissions=discord.Permissions.none())
-            print(f"Created role: {ROLE_NOT_REROLLING}", flush=True)
+            if remove: await member.remove_roles(*remove)
+            if add: await member.add_roles(*add)
+            return True
         except Exception as e:
-            print(f"Failed to create role {ROLE_NOT_REROLLING}: {e}", flush=True)
+            print(f"Failed to update roles for {member.name}: {e}", flush=True)
+            return False
+
+    async def sweep(self, guild, interval):
+        """Reconcile every member, waiting interval seconds after each edit."""
+        edited = 0
+        for member in list(guild.members):
+            if await self.reconcile(member):
+                edited += 1
+                await asyncio.sleep(interval)
+        return edited
+
+ROLES = RoleReconciler(USER_STORE)
 
-    try:
-        if status == 'online':
-            if role_rerolling and role_rerolling not in member.roles: 
-                await member.add_roles(role_rerolling)
-            if role_not_rerolling and role_not_rerolling in member.roles: 
-                await member.remove_roles(role_not_rerolling)
-        else:
-             # Default state (Offline / Unregistered / Removed)
-            if role_not_rerolling and role_not_rerolling not in member.roles: 
-                await member.add_roles(role_not_rerolling)
-            if role_rerolling and role_rerolling in member.roles: 
-                await member.remove_roles(role_rerolling)
-            
-    except Exception as e:
-        print(f"Failed to update roles for {member.name}: {e}", flush=True)
-        
 class PackView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -506,119 +1402,363 @@ class PackView(discord.ui.View):
         
         try:
             await target_channel.send(content=final_msg, files=files)
+            if action == "Alive":
+                # Credit the member the pack message pings, else whoever triaged it
+                owner = next((m for m in interaction.message.mentions if not m.bot), None) or interaction.user
+                LIVE_GPS.record(owner.id)
             await interaction.message.delete() # Clean up original
         except Exception as e:
             await interaction.message.delete()
             await interaction.response.send_message(f"❌ Failed to move: {e}", ephemeral=True)
 
-def add_watermark(image_bytes):
-    try:
-        with Image.open(io.BytesIO(image_bytes)) as img:
-            img = img.convert("RGBA")
-            
-            # Create a transparent text layer
-            txt_layer = Image.new('RGBA', img.size, (255, 255, 255, 0))
-            draw = ImageDraw.Draw(txt_layer)
-            text = "EternalGP"
-            
-            # Calculate dynamic font size (9% of height - Fine tuned)
-            width, height = img.size
-            font_size = int(height * 0.09) 
-            if font_size < 15: font_size = 15
-            
-            try:
-                 font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", font_size)
-            except:
-                 font = ImageFont.load_default()
-
-            # Calculate position (Center)
-            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
-            text_width = right - left
-            text_height = bottom - top
-            
-            x = (width - text_width) / 2
-            y = (height - text_height) / 2
-            
-            # Calculate dynamic stroke width
-            stroke_width = max(1, int(font_size / 25))
-            
-            # Draw Opaque Text with Outline
-            draw.text((x, y), text, font=font, fill=(255, 255, 255, 255), stroke_width=stroke_width, stroke_fill=(0, 0, 0, 255))
-            
-            # Apply Global Transparency (e.g. 35% Opacity)
-            r, g, b, a = txt_layer.split()
-            a = a.point(lambda p: int(p * 0.35))
-            txt_layer = Image.merge('RGBA', (r, g, b, a))
-            
-            # Composite
-            combined = Image.alpha_composite(img, txt_layer)
-            
-            output = io.BytesIO()
-            combined.save(output, format="PNG")
-            output.seek(0)
-            return output
-    except Exception as e:
-        print(f"Error processing image: {e}", flush=True)
-        return None
+WATERMARK_POOL = WatermarkPool(WATERMARK_WORKERS, WATERMARK_MAX_PENDING, WATERMARK_FORMAT, WATERMARK_COMPRESSION)
 
 # --- GITHUB SYNC FUNCTIONS ---
 
-def _blocking_sync(data):
-    if not GITHUB_TOKEN:
-        print("⚠️ GITHUB_TOKEN not found. Skipping sync.", flush=True)
-        return
-
-    codes_1 = set()
-    codes_2 = set()
-    
-    for user_id, info in data.items():
-        # --- List 1: "Main" (ids.txt) ---
-        # Includes: Main IDs (status=online) AND Secondary IDs (secondary_status=online)
-        if info.get('friend_code') and info.get('status') == 'online':
-            codes_1.add(info['friend_code'])
-        if info.get('secondary_code') and info.get('secondary_status') == 'online':
-            codes_1.add(info['secondary_code'])
-            
-        # --- List 2: "Exclusive Bot 2" (ids2.txt) ---
-        # Includes: Main IDs strictly set to status_ids2=online
-        if info.get('friend_code') and info.get('status_ids2') == 'online':
-            codes_2.add(info['friend_code'])
-        # Includes: Secondary IDs strictly set to secondary_status_ids2=online
-        if info.get('secondary_code') and info.get('secondary_status_ids2') == 'online':
-            codes_2.add(info['secondary_code'])
-            
-    content_1 = "\n".join(sorted(list(codes_1)))
-    content_2 = "\n".join(sorted(list(codes_2)))
-
-    try:
-        auth = Auth.Token(GITHUB_TOKEN)
-        g = Github(auth=auth)
-        repo = g.get_repo(REPO_NAME)
-        
-        # Sync ids.txt (Main)
+class GitHubSyncEngine:
+    """Commits staged files that differ from GitHub's copy as one commit (Git Data API)."""
+
+    def __init__(self, repo_name):
+        self.repo_name = repo_name
+        self._github = None
+        self._repo = None
+        self._ref = None
+        self._head = None
+        self.pending = {}   # path -> bytes waiting for the next flush
+        self.remote = {}    # path -> git blob sha of the content GitHub has
+        self.cache = {}     # path -> bytes GitHub has (for read-modify-write callers)
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _hash(content):
+        return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+    @staticmethod
+    def _encode(content):
+        return content.encode() if isinstance(content, str) else content
+
+    def client(self):
+        """The shared long-lived client."""
+        if self._github is None:
+            auth = Auth.Token(GITHUB_TOKEN)
+            self._github = Github(auth=auth, pool_size=GITHUB_POOL_SIZE, lazy=True)
+        return self._github
+
+    def throttle(self):
+        """Sleep until the rate limit resets if we're about to run out of requests."""
+        requester = self.client().requester
+        remaining, limit = requester.rate_limiting # Updated from every response's headers
+        if 0 <= remaining < GITHUB_RATE_LIMIT_RESERVE:
+            wait = requester.rate_limiting_resettime - time.time()
+            if wait > 0:
+                print(f"⏳ GitHub rate limit low ({remaining}/{limit}), waiting {int(wait)}s", flush=True)
+                time.sleep(wait)
+
+    def repo(self):
+        """Cached repo handle; throttles first."""
+        self.throttle()
+        if self._repo is None:
+            self._repo = self.client().get_repo(self.repo_name)
+        return self._repo
+
+    def remember(self, path, content):
+        """Record content known to be on GitHub."""
+        content = self._encode(content)
+        with self.lock:
+            self.remote[path] = self._hash(content)
+            self.cache[path] = content
+
+    def read(self, path):
+        """Bytes GitHub has for path, or None."""
+        with self.lock:
+            if path in self.pending:
+                return self.pending[path]
+            if path in self.cache:
+                return self.cache[path]
         try:
-            contents = repo.get_contents("ids.txt")
-            if contents.decoded_content.decode() != content_1:
-                 repo.update_file(contents.path, "[skip ci] [skip render] Bot: Update ids.txt", content_1, contents.sha)
-                 print("🚀 Pushed to GitHub (ids.txt Updated)!", flush=True)
+            content = self.repo().get_contents(path).decoded_content
         except Exception:
-            repo.create_file("ids.txt", "[skip ci] [skip render] Bot: Create ids.txt", content_1)
-            print("🚀 Pushed to GitHub (ids.txt Created)!", flush=True)
-
-        # Sync ids2.txt (Exclusive Backup/Bot 2)
+            return None
+        self.remember(path, content)
+        return content
+
+    def stage(self, path, content):
+        with self.lock:
+            self.pending[path] = self._encode(content)
+
+    def is_pending(self, path):
+        """True if path is staged but not yet on GitHub."""
+        with self.lock:
+            return path in self.pending
+
+    def _load_head(self):
+        repo = self.repo()
+        ref = repo.get_git_ref(f"heads/{GITHUB_BRANCH}")
+        head = repo.get_git_commit(ref.object.sha)
+        blobs = {e.path: e.sha for e in repo.get_git_tree(head.tree.sha, recursive=True).tree if e.type == "blob"}
+        with self.lock:
+            self._ref, self._head = ref, head
+            # The branch may have been edited outside the bot: GitHub's hashes replace the ones from earlier flushes
+            for path in list(self.remote):
+                if blobs.get(path) != self.remote[path]:
+                    del self.remote[path]
+                    self.cache.pop(path, None)
+            self.remote.update(blobs)
+
+    def remember_tree(self, directory):
+        """Reload the head's blob SHAs; returns the file count under directory."""
+        self._load_head()
+        with self.lock:
+            return sum(1 for path in self.remote if path.startswith(f"{directory}/"))
+
+    def _tree_element(self, path, content, shared=None):
+        if shared and self._hash(content) in shared:
+            return InputGitTreeElement(path, "100644", "blob", sha=shared[self._hash(content)])
         try:
-            contents = repo.get_contents("ids2.txt")
-            if contents.decoded_content.decode() != content_2:
-                repo.update_file(contents.path, "[skip ci] [skip render] Bot: Update ids2.txt", content_2, contents.sha)
-                print("🚀 Pushed to GitHub (ids2.txt Updated)!", flush=True)
-        except Exception:
-            repo.create_file("ids2.txt", "[skip ci] [skip render] Bot: Create ids2.txt", content_2)
-            print("🚀 Pushed to GitHub (ids2.txt Created)!", flush=True)
-            
+            return InputGitTreeElement(path, "100644", "blob", content=content.decode("utf-8"))
+        except UnicodeDecodeError:
+            blob = self.repo().create_git_blob(base64.b64encode(content).decode(), "base64")
+            return InputGitTreeElement(path, "100644", "blob", sha=blob.sha)
+
+    def flush(self, message="[skip ci] [skip render] Bot: Sync data"):
+        """Commit every staged file that changed. Returns the pushed paths."""
+        with self.lock:
+            if not GITHUB_TOKEN:
+                self.pending.clear()
+                return []
+            changes = {path: content for path, content in self.pending.items()
+                       if self.remote.get(path) != self._hash(content)}
+            self.pending.clear()
+        if not changes:
+            return []
+        # No lock held from here: requests (and throttle() sleeps) mustn't block stage() or the other executor worker.
+        # A flush racing this one is caught by the non-forced ref update below and retried on the new head.
+        start = time.perf_counter()
+        for attempt in range(2):
+            try:
+                if self._head is None:
+                    self._load_head()
+                head, ref = self._head, self._ref
+                repo = self.repo()
+                # Upload content that several paths share once and point them all at it
+                counts = {}
+                for content in changes.values():
+                    counts[self._hash(content)] = counts.get(self._hash(content), 0) + 1
+                shared = {}
+                for content in changes.values():
+                    digest = self._hash(content)
+                    if counts[digest] > 1 and digest not in shared:
+                        shared[digest] = repo.create_git_blob(base64.b64encode(content).decode(), "base64").sha
+                elements = [self._tree_element(path, content, shared) for path, content in changes.items()]
+                tree = repo.create_git_tree(elements, base_tree=head.tree)
+                commit = repo.create_git_commit(message, tree, [head])
+                ref.edit(commit.sha)
+                with self.lock:
+                    self._head = commit
+                    for path, content in changes.items():
+                        self.remote[path] = self._hash(content)
+                        self.cache[path] = content
+                metrics.GITHUB_SYNC_SECONDS.observe(time.perf_counter() - start)
+                print(f"🚀 Pushed to GitHub ({', '.join(sorted(changes))})", flush=True)
+                return list(changes)
+            except Exception as e:
+                # Most likely the branch moved underneath us -> reload head and retry
+                self._head = None
+                if attempt:
+                    print(f"❌ GitHub API Error: {e}", flush=True)
+        metrics.GITHUB_SYNC_FAILURES.inc()
+        with self.lock:
+            # Keep the changes for the next flush (unless newer content was staged meanwhile)
+            for path, content in changes.items():
+                self.pending.setdefault(path, content)
+        return []
+
+GITHUB_SYNC = GitHubSyncEngine(REPO_NAME)
+# All blocking GitHub work runs here, off the default pool and at most two at a time
+GITHUB_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="github")
+
+# --- VIP IDS ---
+def _blocking_load_vip():
+    """vip_ids.txt as bytes, b"" if it doesn't exist yet, None if GitHub can't be reached."""
+    if not GITHUB_TOKEN: return b""
+    try:
+        content = GITHUB_SYNC.repo().get_contents(VIP_FILE).decoded_content
+    except UnknownObjectException:
+        return b""
     except Exception as e:
-        print(f"❌ GitHub API Error: {e}", flush=True)
-
-async def sync_to_github(data):
+        print(f"⚠️ Could not download {VIP_FILE}: {e}", flush=True)
+        return None
+    GITHUB_SYNC.remember(VIP_FILE, content)
+    try:
+        # Learn the personal files' hashes so unchanged ones aren't re-uploaded
+        GITHUB_SYNC.remember_tree(PERSONAL_DIR)
+    except Exception as e:
+        print(f"⚠️ Could not list {PERSONAL_DIR}/: {e}", flush=True)
+    return content
+
+def _blocking_publish_vip(files, message):
+    """Commit vip_ids.txt and personal files together; True once GitHub has them all."""
+    for path, content in files.items():
+        GITHUB_SYNC.stage(path, content)
+    GITHUB_SYNC.flush(message)
+    return not any(GITHUB_SYNC.is_pending(path) for path in files)
+
+class PersonalFiles:
+    """users/<personal_file> for every member that has one.
+
+    Each file is the VIP list minus the member's excluded_ids. collect()
+    remembers which VIP version and exclusions each member's file was built
+    from and only re-renders members where one of them changed. Members
+    without exclusions share the VIP body itself, and the sync engine skips
+    any file whose hash GitHub already has.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.built = {} # user_id -> (path, vip version, excluded ids)
+
+    @staticmethod
+    def path_for(name):
+        if not name or os.path.basename(name) != name or name in (".", ".."):
+            return None
+        return f"{PERSONAL_DIR}/{name}"
+
+    def collect(self, ids):
+        """{path: content} for personal files that need (re)building against ids."""
+        changed = {}
+        lines = None
+        for user_id, info in self.store.users():
+            path = self.path_for(info.get("personal_file"))
+            if path is None:
+                continue
+            excluded = frozenset(info.get("excluded_ids") or ())
+            state = (path, ids.version, excluded)
+            if self.built.get(user_id) == state:
+                continue
+            if excluded:
+                if lines is None:
+                    lines = ids.render().split("\n")
+                changed[path] = "\n".join(code for code in lines if code not in excluded)
+            else:
+                changed[path] = ids.render()
+            self.built[user_id] = state
+        return changed
+
+    def forget(self, paths):
+        """Rebuild these files next time (their upload failed)."""
+        for user_id, state in list(self.built.items()):
+            if state[0] in paths:
+                del self.built[user_id]
+
+PERSONAL_FILES = PersonalFiles(USER_STORE)
+
+class VipList:
+    """The VIP IDs published as vip_ids.txt, held in memory.
+
+    Loaded from GitHub at startup; after that the set here is authoritative.
+    add()/remove() only touch the set. Changes are committed by one publish
+    per window (or right away via publish()), so a burst of detections
+    becomes a single write. Until the file has been loaded (add()/remove()
+    retry the load) changes are refused, so they can't clobber it.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.ids = PublishedIds()
+        self.loaded = False
+        self.published_version = 0
+        self.added = set() # Changes since the last successful publish (for the log/commit message)
+        self.removed = set()
+        self._timer = None
+        self._lock = asyncio.Lock()
+
+    def __contains__(self, vip_id):
+        return vip_id in self.ids
+
+    async def load(self):
+        if self.loaded:
+            return True
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(GITHUB_EXECUTOR, _blocking_load_vip)
+        if content is None or self.loaded:
+            return self.loaded
+        # A repeated line counts once, or remove() would only drop one of its references
+        for vip_id in {line.strip() for line in content.decode().splitlines()} - {""}:
+            self.ids.add(vip_id)
+        self.published_version = self.ids.version
+        self.loaded = True
+        print(f"💎 Loaded {len(self.ids)} VIP IDs", flush=True)
+        return True
+
+    def _apply(self, op, vip_id):
+        if op == "add" and vip_id not in self.ids:
+            self.ids.add(vip_id)
+            self.removed.discard(vip_id)
+            self.added.add(vip_id)
+            return True
+        if op == "remove" and vip_id in self.ids:
+            self.ids.remove(vip_id)
+            self.added.discard(vip_id)
+            self.removed.add(vip_id)
+            return True
+        return False
+
+    async def _change(self, op, vip_id):
+        if not await self.load():
+            print(f"⚠️ {VIP_FILE} isn't loaded; ignored {op} of VIP ID {vip_id}", flush=True)
+            return False
+        changed = self._apply(op, vip_id)
+        if changed:
+            self._schedule()
+        return changed
+
+    def _schedule(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._publish_later())
+
+    async def add(self, vip_id):
+        """Add a VIP ID; False if it was already listed or the list can't be loaded."""
+        return await self._change("add", vip_id)
+
+    async def remove(self, vip_id):
+        """Remove a VIP ID; False if it wasn't listed or the list can't be loaded."""
+        return await self._change("remove", vip_id)
+
+    async def _publish_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None # Changes from here on start the next window
+        if not await self.publish() or self.ids.version != self.published_version:
+            # Failed (changes are kept) or more arrived meanwhile: go again next window
+            self._schedule()
+
+    async def publish(self):
+        """Commit pending changes (and the personal files built from them) now. True if GitHub is up to date."""
+        async with self._lock:
+            if not await self.load():
+                return False
+            version = self.ids.version
+            files = PERSONAL_FILES.collect(self.ids)
+            if version == self.published_version and not files:
+                return True
+            personal = len(files)
+            if version != self.published_version:
+                files[VIP_FILE] = self.ids.render()
+            added, removed = sorted(self.added), sorted(self.removed)
+            message = f"[skip ci] [skip render] Bot: Update VIP IDs (+{len(added)} / -{len(removed)}, {personal} personal files)"
+            loop = asyncio.get_running_loop()
+            ok = await loop.run_in_executor(GITHUB_EXECUTOR, _blocking_publish_vip, files, message)
+            if not ok:
+                PERSONAL_FILES.forget(files)
+                return False
+            self.published_version = version
+            self.added.difference_update(added)
+            self.removed.difference_update(removed)
+            print(f"💎 Published {VIP_FILE}: +{len(added)} / -{len(removed)} ({len(self.ids)} IDs), checked {personal} personal files", flush=True)
+            return True
+
+VIP_LIST = VipList(VIP_PUBLISH_WINDOW_SECONDS)
+
+async def sync_to_github():
     # Instead of syncing immediately, just mark as needed.
     # The background task 'auto_github_sync' will handle it.
     global GITHUB_SYNC_NEEDED
@@ -628,35 +1768,43 @@ async def sync_to_github(data):
 def _blocking_initial_sync():
     if not GITHUB_TOKEN: return
     try:
-        auth = Auth.Token(GITHUB_TOKEN)
-        g = Github(auth=auth)
-        repo = g.get_repo(REPO_NAME)
+        repo = GITHUB_SYNC.repo()
         
         # 1. Download users.json
-        data = {}
         try:
             contents = repo.get_contents(DATA_FILE)
             with open(DATA_FILE, "wb") as f:
                 f.write(contents.decoded_content)
-            with open(DATA_FILE, "r") as f:
-                data = json.load(f)
+            GITHUB_SYNC.remember(DATA_FILE, contents.decoded_content)
             print(f"✅ Downloaded {DATA_FILE}", flush=True)
         except Exception as e:
             print(f"⚠️ Could not download {DATA_FILE}: {e}", flush=True)
 
+        # 1.1 Download pack samples (kept out of users.json)
+        try:
+            s_contents = repo.get_contents(SAMPLES_FILE)
+            with open(SAMPLES_FILE, "wb") as f:
+                f.write(s_contents.decoded_content)
+            GITHUB_SYNC.remember(SAMPLES_FILE, s_contents.decoded_content)
+            print(f"✅ Downloaded {SAMPLES_FILE}", flush=True)
+        except Exception as e:
+            print(f"⚠️ Could not download {SAMPLES_FILE}: {e}", flush=True)
+
         # 2. Download Whitelist
         try:
             try:
                 w_contents = repo.get_contents(WHITELIST_FILE)
                 with open(WHITELIST_FILE, "wb") as f:
                     f.write(w_contents.decoded_content)
+                GITHUB_SYNC.remember(WHITELIST_FILE, w_contents.decoded_content)
                 print(f"✅ Downloaded {WHITELIST_FILE}", flush=True)
             except Exception:
                  # File doesn't exist on GitHub -> Create it with Defaults
                  print(f"⚠️ {WHITELIST_FILE} not found on GitHub. Creating defaults...", flush=True)
                  defaults = ["MegaGyarados", "MegaBlaziken", "MegaAltaria", "CrimsonBlaze"]
                  content = "\n".join(sorted(defaults))
-                 repo.create_file(WHITELIST_FILE, "[skip ci] [skip render] Bot: Init Whitelist", content)
+                 GITHUB_SYNC.stage(WHITELIST_FILE, content)
+                 GITHUB_SYNC.flush("[skip ci] [skip render] Bot: Init Whitelist")
                  # Also save locally
                  with open(WHITELIST_FILE, "w") as f:
                      f.write(content)
@@ -670,12 +1818,14 @@ def _blocking_initial_sync():
                 w2_contents = repo.get_contents(WHITELIST2_FILE)
                 with open(WHITELIST2_FILE, "wb") as f:
                     f.write(w2_contents.decoded_content)
+                GITHUB_SYNC.remember(WHITELIST2_FILE, w2_contents.decoded_content)
                 print(f"✅ Downloaded {WHITELIST2_FILE}", flush=True)
             except Exception:
                  print(f"⚠️ {WHITELIST2_FILE} not found on GitHub. Creating defaults...", flush=True)
                  defaults = ["Mewtwo", "Pikachu", "Charizard"]
                  content = "\n".join(sorted(defaults))
-                 repo.create_file(WHITELIST2_FILE, "[skip ci] [skip render] Bot: Init Whitelist 2", content)
+                 GITHUB_SYNC.stage(WHITELIST2_FILE, content)
+                 GITHUB_SYNC.flush("[skip ci] [skip render] Bot: Init Whitelist 2")
                  with open(WHITELIST2_FILE, "w") as f:
                      f.write(content)
                  print(f"🚀 Created {WHITELIST2_FILE} on GitHub and Local.", flush=True)
@@ -691,28 +1841,12 @@ def _blocking_initial_sync():
                 print("🚀 Created .nojekyll to speed up Pages deployment!", flush=True)
         except Exception: pass
 
-        # 3. Download ids.txt and Sync Status
+        # 3. Download ids.txt (statuses are synced against it once the store is loaded)
         try:
-            ids_content = repo.get_contents("ids.txt")
-            online_ids = set(ids_content.decoded_content.decode().splitlines())
-            
-            updated = False
-            for user_id, info in data.items():
-                code = info.get('friend_code')
-                if code in online_ids:
-                    if info.get('status') != 'online':
-                        info['status'] = 'online'
-                        updated = True
-                else:
-                    if info.get('status') == 'online':
-                        info['status'] = 'offline'
-                        updated = True
-            
-            if updated:
-                with open(DATA_FILE, "w") as f:
-                    json.dump(data, f, indent=4)
-                print("🔄 Synced local statuses with ids.txt", flush=True)
-                
+            ids_content = GITHUB_SYNC.read("ids.txt")
+            if ids_content is None: raise Exception("ids.txt not found")
+            GITHUB_SYNC.read("ids2.txt") # Remember it too so an unchanged list isn't re-pushed
+            return set(ids_content.decode().splitlines())
         except Exception as e:
             print(f"⚠️ Could not sync with ids.txt: {e}", flush=True)
 
@@ -720,73 +1854,79 @@ def _blocking_initial_sync():
         print(f"❌ GitHub Init Error: {e}", flush=True)
 
 async def download_users_from_github():
+    """Download the data files; returns the IDs on ids.txt, or None if unavailable."""
     loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, _blocking_initial_sync)
-
-def _blocking_upload(data):
-    if not GITHUB_TOKEN: return
-    json_content = json.dumps(data, indent=4)
+    return await loop.run_in_executor(GITHUB_EXECUTOR, _blocking_initial_sync)
+
+def sync_statuses_with_ids(online_ids):
+    """Set each primary ID online/offline to match the published ids.txt."""
+    updated = 0
+    # Checked per record rather than through the code index: a code duplicated in users.json is indexed to one holder only
+    for user_id, info in USER_STORE.users():
+        if info.get('friend_code') in online_ids:
+            if info.get('status') != 'online':
+                USER_STORE.update(user_id, status='online')
+                updated += 1
+        elif info.get('status') == 'online':
+            USER_STORE.update(user_id, status='offline')
+            updated += 1
+
+    if updated:
+        print(f"🔄 Synced {updated} local statuses with ids.txt", flush=True)
+
+def _blocking_upload(data, content_1, content_2):
+    """Commit users.json, samples.bin and both ID lists; True once GitHub has them all."""
+    if not GITHUB_TOKEN: return True
     try:
-        auth = Auth.Token(GITHUB_TOKEN)
-        g = Github(auth=auth)
-        repo = g.get_repo(REPO_NAME)
-        try:
-            contents = repo.get_contents(DATA_FILE)
-            if isinstance(contents, list): raise Exception("Data file matches multiple items.")
-            
-            repo.update_file(contents.path, "[skip ci] [skip render] Bot: Save User DB", json_content, contents.sha)
-        except Exception:
-            try: repo.create_file(DATA_FILE, "[skip ci] [skip render] Bot: Create User DB", json_content)
-            except: pass # File likely exists or conflict
-        
-        print(f"💾 Saved {DATA_FILE} to GitHub", flush=True)
+        GITHUB_SYNC.stage(DATA_FILE, _serialize_users(data))
+        if os.path.exists(SAMPLES_FILE):
+            with open(SAMPLES_FILE, "rb") as f:
+                GITHUB_SYNC.stage(SAMPLES_FILE, f.read())
 
-        # Also sync IDs while we're at it (Since we have the data)
-        _blocking_sync(data)
+        # Also sync IDs while we're at it
+        # -> users.json, samples and both ID lists land in one commit
+        GITHUB_SYNC.stage("ids.txt", content_1)
+        GITHUB_SYNC.stage("ids2.txt", content_2)
+        GITHUB_SYNC.flush("[skip ci] [skip render] Bot: Save User DB")
 
     except Exception as e:
         print(f"❌ Failed to save {DATA_FILE} to GitHub: {e}", flush=True)
+        return False
+    return not any(GITHUB_SYNC.is_pending(path) for path in (DATA_FILE, SAMPLES_FILE, "ids.txt", "ids2.txt"))
 
-async def upload_users_to_github(data):
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, _blocking_upload, data)
-
-async def save_data_async(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
-    await upload_users_to_github(data)
+async def push_user_db():
+    """Push the user DB if anything changed since the last push. True if GitHub is up to date."""
+    global GITHUB_SYNC_NEEDED
+    if not GITHUB_SYNC_NEEDED:
+        return True
+    # Cleared before the snapshot: changes made while this upload runs flag the next one
+    GITHUB_SYNC_NEEDED = False
+    ok = False
+    try:
+        loop = asyncio.get_running_loop()
+        # ID list bodies are rendered here, from the store's maintained sets (cached until they change)
+        ok = await loop.run_in_executor(GITHUB_EXECUTOR, _blocking_upload, USER_STORE.snapshot(),
+                                        USER_STORE.published[1].render(), USER_STORE.published[2].render())
+    finally:
+        if not ok:
+            GITHUB_SYNC_NEEDED = True
+    return ok
 
 async def update_channel_status(bot_instance):
-    global LAST_CHANNEL_UPDATE
-    
-    # THROTTLE: 5m 30s (330s) to avoid 2/10m limit
-    if time.time() - LAST_CHANNEL_UPDATE < 330:
-        return
-
-    data = load_data()
-    online_count = count_online_users(data)
+    online_count = count_online_users(USER_STORE.data)
     
     new_prefix = "🟢" if online_count > 0 else "🔴"
     
     # Format: 🟢︱check-in︱3
     new_name = f"{new_prefix}︱{CHECKIN_CHANNEL_NAME}︱{online_count}"
     
-    LAST_CHANNEL_UPDATE = time.time()
-
-    
-    # We scan all guilds (usually just one)
+    # We scan all guilds (usually just one). Renames are rate limited to 2/10m,
+    # so RENAMES applies the latest count as soon as the channel has budget.
     for guild in bot_instance.guilds:
         channel = get_checkin_channel(guild)
         
         if channel:
-            if channel.name == new_name:
-                continue # Already correct
-            
-            try:
-                await channel.edit(name=new_name)
-                print(f"🔄 Renamed channel to: {new_name}", flush=True)
-            except Exception as e:
-                print(f"⚠️ Channel Rename Rate Limited (Ignored): {e}", flush=True)
+            RENAMES.request(channel, new_name)
 
 async def cleanup_duplicate_roles(guild):
     # Cleanup Rerolling Duplicates
@@ -818,9 +1958,13 @@ async def cleanup_duplicate_roles(guild):
 async def health_check(request):
     return web.Response(text="Bot is ALIVE!")
 
+async def metrics_handler(request):
+    return web.Response(body=metrics.REGISTRY.render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
 async def start_dummy_server():
     app = web.Application()
     app.router.add_get('/', health_check)
+    app.router.add_get('/metrics', metrics_handler)
     runner = web.AppRunner(app)
     await runner.setup()
     port = int(os.environ.get("PORT", 8080))
@@ -839,7 +1983,15 @@ class MyBot(commands.Bot):
         super().__init__(command_prefix="!", intents=intents)
 
     async def setup_hook(self):
-        await download_users_from_github()
+        online_ids = await download_users_from_github()
+        await VIP_LIST.load()
+        USER_STORE.load()
+        await VIP_LIST.publish() # Bring users/*.txt in line with vip_ids.txt and excluded_ids
+        if online_ids is not None:
+            sync_statuses_with_ids(online_ids)
+        PACK_SAMPLES.load()
+        PACK_SAMPLES.adopt_legacy(USER_STORE)
+        self.flush_user_store.start()
         await self.tree.sync()
         self.add_view(PackView()) # Persist View
         self.auto_github_sync.start() # Start the background sync task
@@ -859,12 +2011,11 @@ class MyBot(commands.Bot):
         url = os.environ.get("RENDER_EXTERNAL_URL")
         if url:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as resp:
-                        if resp.status == 200:
-                            print(f"💓 Self-Ping Successful: {url}", flush=True)
-                        else:
-                            print(f"⚠️ Self-Ping Failed: {resp.status} - {url}", flush=True)
+                async with get_http_session().get(url) as resp:
+                    if resp.status == 200:
+                        print(f"💓 Self-Ping Successful: {url}", flush=True)
+                    else:
+                        print(f"⚠️ Self-Ping Failed: {resp.status} - {url}", flush=True)
             except Exception as e:
                 print(f"❌ Self-Ping Error: {e}", flush=True)
         else:
@@ -878,8 +2029,6 @@ class MyBot(commands.Bot):
             if not channel: channel = await self.fetch_channel(HEARTBEAT_MONITOR_ID)
             if not channel: return
 
-            data = load_data()
-
             # --- 0. HYDRATION (Backfill from History) ---
             if not self.history_hydrated:
                 print("⏳ Hydrating stats from history (First Run)...", flush=True)
@@ -888,6 +2037,7 @@ class MyBot(commands.Bot):
                     
                     # Track latest state per user to restore session
                     latest_states = {} # {uid: {ts: 0, packs: 0, inst: 0}}
+                    backfill = {} # {uid: [(ts, packs), ...]}
 
                     targets = [HEARTBEAT_MONITOR_ID, HEARTBEAT_MONITOR_2_ID]
 
@@ -899,76 +2049,66 @@ class MyBot(commands.Bot):
                             
                             print(f"   Scanning {h_channel.name}...", flush=True)
 
-                            # Scan last 600 messages
-                            async for msg in h_channel.history(limit=600):
+                            # Resolve heartbeat names with one pass over the member list
+                            by_name = {}
+                            by_display_name = {}
+                            for m in h_channel.guild.members:
+                                by_name.setdefault(m.name, m)
+                                by_display_name.setdefault(m.display_name, m)
+
+                            # Only messages we haven't processed yet (the last 600 on a fresh store)
+                            async for msg in HISTORY_CURSORS.fetch_new(h_channel, first_limit=600):
                                 if not msg.content: continue
-                                lines = msg.content.splitlines()
-                                if len(lines) < 2: continue
-                                
-                                name = lines[0].strip()
-                                content = "\n".join(lines[1:])
-                                
-                                if "Inject 13P+" in content or "Tradeable" in content: continue
-                                if "Type: Inject Wonderpick" not in content: continue
+                                for hb in split_forwarded(msg.content):
+                                    if hb.inject_13p or hb.tradeable: continue
+                                    if not hb.is_wonderpick: continue
                                 
-                                guild = h_channel.guild
-                                member = discord.utils.get(guild.members, name=name)
-                                if not member: member = discord.utils.get(guild.members, display_name=name)
+                                    member = by_name.get(hb.name) or by_display_name.get(hb.name)
                                 
-                                if member:
-                                    uid = str(member.id)
-                                    if uid not in data: data[uid] = {}
-                                    if "samples" not in data[uid]: data[uid]["samples"] = []
+                                    if member:
+                                        uid = str(member.id)
                                     
-                                    packs_match = re.search(r"Packs:\s*(\d+)", content)
-                                    if packs_match:
-                                        p_val = int(packs_match.group(1))
-                                        ts = msg.created_at.replace(tzinfo=timezone.utc).timestamp()
+                                        if hb.packs is not None:
+                                            p_val = hb.packs
+                                            ts = msg.created_at.replace(tzinfo=timezone.utc).timestamp()
                                         
-                                        data[uid]["samples"].append([ts, p_val])
-                                        total_count += 1
+                                            backfill.setdefault(uid, []).append((ts, p_val))
+                                            total_count += 1
                                         
-                                        # Track latest
-                                        if uid not in latest_states or ts > latest_states[uid]['ts']:
-                                            # Try parse instances
-                                            inst_c = 0
-                                            inst_off = 0
-                                            online_line_match = re.search(r"Online:\s*(.+)", content, re.IGNORECASE)
-                                            if online_line_match:
-                                                on_str = online_line_match.group(1).strip()
-                                                if on_str.lower() != "none":
-                                                    items = [x.strip() for x in on_str.split(',') if x.strip()]
-                                                    inst_c = len([x for x in items if x.lower() != "main"])
-                                            
-                                            off_line_match = re.search(r"Offline:\s*(.+)", content, re.IGNORECASE)
-                                            if off_line_match:
-                                                off_str = off_line_match.group(1).strip()
-                                                if off_str.lower() != "none":
-                                                    inst_off = len([x for x in off_str.split(',') if x.strip()])
-
-                                            latest_states[uid] = {
-                                                'ts': ts,
-                                                'packs': p_val,
-                                                'instances': inst_c,
-                                                'offline_instances': inst_off,
-                                                'total_instances': inst_c + inst_off
-                                            }
+                                            # Track latest
+                                            if uid not in latest_states or ts > latest_states[uid]['ts']:
+                                                inst_c = hb.instances
+                                                inst_off = hb.offline_instances
+
+                                                latest_states[uid] = {
+                                                    'ts': ts,
+                                                    'packs': p_val,
+                                                    'instances': inst_c,
+                                                    'offline_instances': inst_off,
+                                                    'total_instances': inst_c + inst_off
+                                                }
 
                         except Exception as e:
                             print(f"   Hydration failed for channel {ch_id}: {e}", flush=True)
 
+                    for uid, samples in backfill.items():
+                        PACK_SAMPLES.merge(uid, samples)
+
                     # Restore Sessions
                     for uid, state in latest_states.items():
-                        if "session" not in data[uid]: data[uid]["session"] = {}
+                        session = USER_STORE.get(uid, {}).get("session", {})
                         
                         # Only update if new state is newer than stored state (should be, usually)
-                        stored_last = data[uid]["session"].get("last_update", 0)
+                        stored_last = session.get("last_update", 0)
                         if state['ts'] > stored_last:
-                            data[uid]["session"]["last_update"] = state['ts']
-                            data[uid]["session"]["current_packs"] = state['packs']
-                            data[uid]["session"]["instances"] = state['instances']
-                            data[uid]["session"]["offline_instances"] = state['offline_instances']
-                            data[uid]["session"]["total_instances"] = state['total_instances']
+                            USER_STORE.update(uid, session={
+                                **session,
+                                "last_update": state['ts'],
+                                "current_packs": state['packs'],
+                                "instances": state['instances'],
+                                "offline_instances": state['offline_instances'],
+                                "total_instances": state['total_instances'],
+                            })
                             
                             # Rough duration restore (timestamp difference from now?)
                             # No, duration is usually time active. We can't easily restore that without full parsing.
@@ -979,160 +2119,12 @@ class MyBot(commands.Bot):
                             # For now, let's just accept they are active.
 
                     self.history_hydrated = True
-                    await save_data_async(data)
                     print(f"✅ Hydration Complete. Backfilled {total_count} samples and restored sessions.", flush=True)
                     
                 except Exception as e:
                     print(f"❌ Critical Hydration Failure: {e}", flush=True)
 
             
-            # --- 1. Calculate Daily Live GPs (Message Counting) ---
-            daily_live_gps = 0
-            try:
-                live_channel = self.get_channel(LIVE_PACKS_ID)
-                if not live_channel: live_channel = await self.fetch_channel(LIVE_PACKS_ID)
-                
-                if live_channel:
-                    # Count messages since midnight UTC
-                    now = datetime.now(timezone.utc)
-                    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                    
-                    async for msg in live_channel.history(limit=None, after=midnight):
-                        if not msg.author.bot: continue # Assume bot posts
-                        daily_live_gps += 1
-            except Exception as e:
-                print(f"Failed to count live GPs: {e}", flush=True)
-
-            # --- 2. Scan Recent Heartbeats for Stats (PPM/Instances) ---
-            active_data = {} # {name: {'instances': 0, 'ppm': 0}}
-            
-            # We look at the last 35 mins of heartbeats to get accurate "current" PPM reporting
-            # This is better than calculating from session because client reports instantaneous PPM
-            cutoff = datetime.now() - timedelta(minutes=35)
-            async for msg in channel.history(limit=200, after=cutoff):
-                if not msg.content: continue
-                # Parse: "MemberName\nContent" (Format from on_message)
-                lines = msg.content.splitlines()
-                if len(lines) < 2: continue
-                
-                name = lines[0].strip()
-                content = "\n".join(lines[1:])
-                
-                if "Type: Inject Wonderpick" not in content: continue
-                if "Inject 13P+" in content: continue # Exclude 13P+ from PPM stats
-
-                # Parse PPM
-                ppm = 0.0
-                ppm_match = re.search(r"Avg:\s*([\d\.]+)\s*packs/min", content)
-                if ppm_match:
-                    try: ppm = float(ppm_match.group(1))
-                    except: pass
-                
-                # Parse Instances (Online/Total) is hard from message content history reliably
-                # So we will stick to `data` (users.json) for Instance counts as it's the latest state
-                
-                # But we use this loop to verify "Active Rerollers" who are actually posting
-                if name not in active_data:
-                    active_data[name] = {'ppm': ppm}
-                else:
-                    # Keep latest PPM (messages are newest first? No, history(after) is oldest first usually, but check params)
-                    # default is newest first if not specified? 
-                    # actually history() yields newest first by default.
-                    # Wait, we used `after`. `after` -> Oldest to Newest.
-                    # So we update to overwrite with newer values
-                    active_data[name]['ppm'] = ppm
-
-            # --- 3. Build Active User List (Rolling 24h) ---
-            # We iterate ALL users to capture anyone active in last 24h
-            report_users = []
-            total_instances_online = 0
-            total_instances_real = 0
-            grand_total_24h = 0
-            
-            now_ts = int(time.time())
-            cutoff_24h = now_ts - 86400 # 24 hours
-            
-            for user_id, info in data.items():
-                if user_id.startswith("_"): continue
-                
-                # Get Name
-                u_obj = self.get_user(int(user_id))
-                name = u_obj.name if u_obj else f"User-{user_id}"
-                
-                session = info.get("session", {})
-                samples = info.get("samples", [])
-                
-                # --- Calculate Rolling 24h Packs (Delta Algo) ---
-                total_24h = 0
-                
-                # Filter valid window
-                valid_samples = [s for s in samples if s[0] > cutoff_24h]
-                # Sort by time just in case
-                valid_samples.sort(key=lambda x: x[0])
-                
-                if valid_samples:
-                    # If we have samples, calculate sum of positive deltas
-                    # Start with first sample's packs? No, start with 0.
-                    # Iterate:
-                    for i in range(1, len(valid_samples)):
-                        prev_p = valid_samples[i-1][1]
-                        curr_p = valid_samples[i][1]
-                        
-                        delta = curr_p - prev_p
-                        
-                        if delta >= 0:
-                            total_24h += delta
-                        else:
-                            # Counter reset (Restart)
-                            # Add full current value (Assume start from 0)
-                            total_24h += curr_p
-                            
-                            # Note: We technically miss the packs between prev_p and the Reset
-                            # But with frequent sampling (5-10m) this is negligible.
-                            
-                # Fallback/Edge Case: If only 1 sample exists in window?
-                # It means they just started. total_24h = 0? 
-                # Or total_24h = current_packs (since they started <24h ago)?
-                # If the ONE sample is close to `cutoff_24h`, we assume baseline 0.
-                # If we have 0 delta samples, we might look at `session.current_packs`?
-                # Actually, `samples` includes the very latest `on_message` update.
-                # So if they just started, valid_samples = [[ts, 5]]. Delta loops 0 times. total_24h = 0.
-                # Use Case: New user, 1st message "Packs: 100".
-                # We want total_24h = 100? No, we don't know if they opened 100 in last 24h or last year.
-                # We strictly count *observed growth*.
-                # BUT, if `session` implies they are active, maybe we trust `current_packs` if it's small?
-                # No, strict delta is safer. "0" until second heartbeat is fine.
-                
-                # Skip if no activity in last 24h
-                if total_24h == 0: continue
-                
-                # Add to Grand Total (All users, even inactive, who contributed in last 24h)
-                grand_total_24h += total_24h
-
-                # --- Current Status (for Display) ---
-                # Active if updated in last 35 mins
-                last_update = session.get("last_update", 0)
-                is_active = (now_ts - last_update) < 2100
-                
-                # Duration
-                duration_min = session.get("duration_minutes", 0)
-                h = duration_min // 60
-                m = duration_min % 60
-                duration_str = f"{h:02d}:{m:02d}"
-                
-                # Instances
-                inst_online = session.get("instances", 0)
-                inst_off = session.get("offline_instances", 0)
-                inst_total = inst_online + inst_off
-                if inst_total == 0 and inst_online > 0: inst_total = inst_online
-                
-                # Display 0/0 if offline/inactive
-                if is_active:
-                     inst_str = f"{inst_online}/{inst_total}"
-                else:
-                     inst_str = "0/0"
-                
-                # PPM check
             # --- Helper: Generate and Post Stats ---
             async def generate_and_post_stats(target_channel_id, user_filter_func):
                 try:
@@ -1140,78 +2132,34 @@ class MyBot(commands.Bot):
                 except: return
 
                 # 1. Filter Users
-                subset_ids = {uid for uid, info in data.items() if user_filter_func(info)}
+                subset_ids = {uid for uid, info in USER_STORE.users() if user_filter_func(info)}
                 
-                # 2. Count Daily Live GPs (Filtered)
-                daily_live_gps = 0
-                try:
-                    live_channel = await self.fetch_channel(LIVE_PACKS_ID)
-                    today_utc = datetime.now(timezone.utc).date()
-                    start_of_day = datetime(today_utc.year, today_utc.month, today_utc.day, tzinfo=timezone.utc)
-                    
-                    async for msg in live_channel.history(limit=50, after=start_of_day):
-                         # Naive check: does the message mention a user in our subset?
-                         # Or check if author is in subset (if user sent it)? 
-                         # Usually bot sends it, mentions user.
-                         # Check mentions
-                         if msg.mentions:
-                             if str(msg.mentions[0].id) in subset_ids:
-                                 daily_live_gps += 1
-                except Exception as e:
-                    print(f"Failed to count live GPs for {target_channel_id}: {e}", flush=True)
-
-                # 3. Aggregation
+                # 2. Aggregation
                 total_instances_online = 0
                 total_instances_real = 0
                 grand_total_24h = 0
+                daily_live_gps = 0 # Counted per user as packs are triaged Alive
                 
                 report_users = []
                 
                 now_ts = int(time.time())
                 
                 for user_id in subset_ids:
-                    u = data[user_id]
+                    u = USER_STORE.get(user_id, {})
                     name = self.get_user(int(user_id)).name if self.get_user(int(user_id)) else f"User {user_id}"
                     
                     session = u.get("session", {})
-                    samples = u.get("samples", [])
                     
                     # Clean Stale Session (Active > 40m ago? Dead)
                     last_update = session.get("last_update", 0)
                     is_active = (now_ts - last_update) < 2500 # 40 minutes + buffer
                     
-                    # Calc 24h Packs (Rolling)
-                    cutoff_24h = now_ts - 86400
-                    valid_samples = [s for s in samples if s[0] > cutoff_24h]
-                    
-                    # Delta: Last Sample - First Sample
-                    # Only if we have samples
-                    total_24h = 0
-                    if valid_samples:
-                        # Sort by TS
-                        valid_samples.sort(key=lambda x: x[0])
-                        # Max packs seen - Min packs seen ? 
-                        # Or packs are cumulative? Yes packs are cumulative in session.
-                        # But different sessions? 
-                        # The samples are [ts, current_packs_val]. 
-                        # If restart, packs reset? No, usually "Packs: X" is session based?
-                        # Wait, "Packs: X" in heartbeat is usually cumulative for that run.
-                        # If they restart, it goes back to 0. 
-                        # We need sum of deltas between resets? 
-                        # Simplified: Max(packs) in window? No, multiple sessions.
-                        # Delta Algorithm:
-                        # Sum of positive increments?
-                        # If s[i+1] < s[i], it reset.
-                        current_sum = 0
-                        for i in range(1, len(valid_samples)):
-                            diff = valid_samples[i][1] - valid_samples[i-1][1]
-                            if diff > 0: current_sum += diff
-                            # If diff < 0, implies reset, ignore (start new session count from 0 to val)
-                            elif diff < 0: current_sum += valid_samples[i][1]
-                        
-                        total_24h = current_sum
+                    # Calc 24h Packs (Rolling, reset-aware delta sum kept up to date per heartbeat)
+                    total_24h = PACK_SAMPLES.total_24h(user_id, now_ts)
 
                     grand_total_24h += total_24h
+                    live_gps = LIVE_GPS.for_user(user_id)
+                    daily_live_gps += live_gps
 
                     # Format Instances
                     inst_online = session.get("instances", 0)
@@ -1249,6 +2197,7 @@ class MyBot(commands.Bot):
                         "total_24h": total_24h,
                         "duration": duration_str if is_active else "Offline",
                         "ppm": user_ppm,
+                        "live_gps": live_gps,
                         "is_active": is_active
                     })
                     
@@ -1259,7 +2208,7 @@ class MyBot(commands.Bot):
                 # --- SORT by 24h Total Descending ---
                 report_users.sort(key=lambda x: x['total_24h'], reverse=True)
 
-                # --- 4. Global Aggregates ---
+                # --- 3. Global Aggregates ---
                 active_rerollers_count = len([u for u in report_users if u['is_active']])
                 
                 global_ppm = sum(u['ppm'] for u in report_users if u['is_active'])
@@ -1268,7 +2217,7 @@ class MyBot(commands.Bot):
                 avg_instances = total_instances_online / active_rerollers_count if active_rerollers_count else 0
                 avg_pph = global_pph / active_rerollers_count if active_rerollers_count else 0
 
-                # --- 5. Construct Embed ---
+                # --- 4. Construct Embed ---
                 embed = discord.Embed(
                     title="Global Stats" if target_channel_id == HEARTBEAT_MONITOR_ID else "Global Stats (List 2)",
                     color=discord.Color(0x00eaff) 
@@ -1293,7 +2242,8 @@ class MyBot(commands.Bot):
                      dur = u['duration']
                      icon = "🖥️" if u['is_active'] else "💤"
                      
-                     msg_text += f"`{u['name']:<15}` {icon} {u['inst_str']} | Packs: {u['total_24h']} | ⏱️ {dur}\n"
+                     gps = f" | 🌟 {u['live_gps']}" if u['live_gps'] else ""
+                     msg_text += f"`{u['name']:<15}` {icon} {u['inst_str']} | Packs: {u['total_24h']}{gps} | ⏱️ {dur}\n"
 
                 await channel.send(content=msg_text, embed=embed)
 
@@ -1301,38 +2251,65 @@ class MyBot(commands.Bot):
             # Report 1: Main (status or secondary_status is online)
             await generate_and_post_stats(
                 HEARTBEAT_MONITOR_ID, 
-                lambda info: info.get('status') == 'online' or info.get('secondary_status') == 'online'
+                lambda info: 1 in online_lists(info)
             )
             
             # Report 2: List 2 (status_ids2 or secondary_status_ids2 is online)
             await generate_and_post_stats(
                 HEARTBEAT_MONITOR_2_ID, 
-                lambda info: info.get('status_ids2') == 'online' or info.get('secondary_status_ids2') == 'online'
+                lambda info: 2 in online_lists(info)
             )
 
         except Exception as e:
             print(f"Failed to post aggregated stats: {e}", flush=True)
 
+    @tasks.loop(seconds=USER_STORE_FLUSH_SECONDS)
+    async def flush_user_store(self):
+        await USER_STORE.flush()
+        await PACK_SAMPLES.flush()
+
+    async def close(self):
+        # Persist whatever the flush loop hasn't written yet
+        await HEARTBEAT_INGEST.drain(10) # Handled heartbeats still queue forwards...
+        await OUTBOUND.drain(10)
+        await USER_STORE.flush()
+        await PACK_SAMPLES.flush()
+        # The local disk doesn't survive a redeploy and startup restores from GitHub
+        await push_user_db()
+        await VIP_LIST.publish()
+        await close_http_session()
+        WATERMARK_POOL.shutdown()
+        await super().close()
+
     @tasks.loop(seconds=60)
     async def auto_github_sync(self):
-        global GITHUB_SYNC_NEEDED
         if GITHUB_SYNC_NEEDED:
             print("⏳ Background Sync: Changes detected, pushing to GitHub...", flush=True)
-            data = load_data() # Reload freshest data
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, _blocking_upload, data) # Use _blocking_upload
-            GITHUB_SYNC_NEEDED = False
-            print("✅ Background Sync: Complete.", flush=True)
+            if await push_user_db():
+                print("✅ Background Sync: Complete.", flush=True)
+            else:
+                print("⚠️ Background Sync: Failed, retrying next cycle.", flush=True)
 
     async def on_ready(self):
         print(f"Logged in as {self.user} (ID: {self.user.id})", flush=True)
         print("------", flush=True)
         await update_channel_status(self)
+        HOME_CHANNELS.backfill(self.guilds)
         
-        
-        # Sync Roles for ALL Members (Startup) - REMOVED TO PREVENT RATE LIMITS
-        # The bot will now only update roles on heartbeat/join/command interactions.
-        print("✅ Startup complete (Skipped mass role sync).", flush=True)
+        # Sync Roles for ALL Members - paced, and only members whose roles are wrong get an edit
+        if not self.sweep_roles.is_running():
+            self.sweep_roles.start()
+        print("✅ Startup complete.", flush=True)
+
+    @tasks.loop(hours=6)
+    async def sweep_roles(self):
+        for guild in self.guilds:
+            try:
+                edited = await ROLES.sweep(guild, ROLE_SWEEP_INTERVAL)
+                if edited:
+                    print(f"🎭 Role sweep fixed {edited} members in {guild.name}", flush=True)
+            except Exception as e:
+                print(f"Role sweep failed for {guild.name}: {e}", flush=True)
        
     @tasks.loop(hours=1)
     async def cleanup_checkin(self):
@@ -1367,62 +2344,29 @@ class MyBot(commands.Bot):
                 continue
 
             try:
-                # Stats dictionary: {member_name: ppm}
-                member_stats = {}
-                
-                # Fetch lookback (30 min heartbeat + 10 min buffer)
-                cutoff = datetime.now() - timedelta(minutes=40)
-                
-                # Process NEWEST messages first
-                async for message in channel.history(limit=100, after=cutoff):
-                    if not message.content: continue
-                    
-                    # FILTER: Only include specific bot types
-                    if "Type: Inject Wonderpick 96P+" not in message.content:
-                        continue
-
-                    lines = message.content.splitlines()
-                    if not lines: continue
-                    
-                    # First line is ID/Name
-                    member_name = lines[0].strip()
-                    
-                    # Extract PPM
-                    match = re.search(r"Avg:\s*([\d\.]+)\s*packs/min", message.content)
-                    if match:
-                        try:
-                            ppm = float(match.group(1))
-                            member_stats[member_name] = ppm
-                        except ValueError:
-                            pass
-            
-                # Sum totals
-                total_ppm = sum(member_stats.values())
+                # Latest PPM per member over the last 40 min, recorded as heartbeats are forwarded
+                await HEARTBEAT_FEED.warm(channel)
+                total_ppm = HEARTBEAT_FEED.total_ppm(ch_id)
                 print(f"💓 [CH {ch_id}] PPM: {total_ppm}", flush=True)
                 
                 # Rename Channel (Rounded to nearest int)
                 new_name = f"💓︱{base_name}︱{int(round(total_ppm))} PPM"
-                if channel.name != new_name:
-                    await channel.edit(name=new_name)
-                    print(f"💓 Updated Channel Name: {new_name}", flush=True)
+                RENAMES.request(channel, new_name)
                     
             except Exception as e:
                 print(f"Failed to update Heartbeat PPM for {ch_id}: {e}", flush=True)
 
     @tasks.loop(minutes=10)
     async def check_bans(self):
-        data = load_data()
-        changed = False
         current_time = datetime.now()
         
-        for user_id, info in list(data.items()):
+        for user_id, info in USER_STORE.users():
             ban_expiry_str = info.get("ban_expiry")
             if ban_expiry_str:
                 try:
                     ban_expiry = datetime.fromisoformat(ban_expiry_str)
                     if current_time > ban_expiry:
-                        del data[user_id]["ban_expiry"]
-                        changed = True
+                        USER_STORE.discard(user_id, "ban_expiry")
                         
                         if self.guilds:
                             guild = self.guilds[0]
@@ -1434,8 +2378,210 @@ class MyBot(commands.Bot):
                 except Exception as e:
                     print(f"Error checking ban for {user_id}: {e}", flush=True)
 
-        if changed:
-            await save_data_async(data)
+
+    async def process_heartbeat(self, message, hb):
+        """Police, record and forward one heartbeat (run by the ingest workers, in order per channel)."""
+        log.debug("Webhook message detected in %s", message.channel.name)
+        started = time.perf_counter()
+        result = "unregistered"
+        try:
+            # Identify Member via the home channel index (falls back to presence in the channel)
+            member = HOME_CHANNELS.owner(message.channel)
+
+            log.debug("Resolved member via home index: %s", member)
+
+            user_id = str(member.id) if member else None
+            
+            in_db = user_id in USER_STORE if user_id else False
+            log.debug("User ID: %s | In DB: %s", user_id, in_db)
+            
+            if in_db:
+                result = "processed"
+                reason = None
+                
+                current_time = hb.time or 0
+                current_packs = hb.packs or 0
+
+                # --- BRANCH: Quiet Removal (13P+ / Create Bots) ---
+                if hb.is_quiet_removal:
+                    # Check if actually on the list before removing
+                    f_code = USER_STORE.get(user_id, {}).get('friend_code')
+                    s_code = USER_STORE.get(user_id, {}).get('secondary_code')
+                    
+                    if await is_user_publicly_online(f_code, s_code):
+                        print(f"📉 Quiet Removal for {member.name} (Non-96P Type)", flush=True)
+                        USER_STORE.update(user_id, status='offline', secondary_status='offline')
+                        USER_STORE.discard(user_id, 'last_heartbeat')
+                        await sync_to_github()
+                        await ROLES.reconcile(member)
+                        await update_channel_status(self)
+                    else:
+                        print(f"ℹ️ Skipping Quiet Removal for {member.name} (Not in public list)", flush=True)
+                    
+                    # We forward for log but stop processing
+                    
+                # 3. God Pack Logging (Global Stats)
+                elif message.channel.id == GOD_PACK_LOG_CHANNEL_ID:
+                    if hb.god_pack:
+                        print(f"🌟 God Pack Detected via Log!", flush=True)
+                        global_stats = USER_STORE.global_stats
+                        current_day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+                        daily_god_packs = global_stats.get("daily_god_packs", 0)
+                         # Reset if new day
+                        if global_stats.get("last_reset_day") != current_day:
+                             daily_god_packs = 0
+                             
+                        USER_STORE.update("_global_stats", daily_god_packs=daily_god_packs + 1, last_reset_day=current_day)
+                    return # Done
+
+                # --- BRANCH: Strict Policing (Wonderpick 96P+ ONLY) ---
+                elif hb.is_96p:
+                    # --- RULE 2: "1P Method" ---
+                    if hb.one_p_method:
+                        reason = "Forbidden Strategy: 1P Method detected."
+                    
+                    # --- RULE 1: Stalling ---
+                    if not reason and hb.time is not None:
+                        last_stats = USER_STORE.get(user_id, {}).get('last_heartbeat', {})
+                        last_time = last_stats.get('time', 0)
+                        last_packs = last_stats.get('packs', 0)
+                        
+                        if last_time > 0 and (current_time - last_time) >= 25 and current_packs == last_packs:
+                            reason = f"Stalling Detected: Time passed ({current_time - last_time}m) but Packs did not increase."
+                            
+                    # --- RULE 3: Wrong Pack Type ---
+                    if not reason and hb.opening is not None:
+                        # --- WHITELIST CHECK ---
+                        # Determine which whitelist applies
+                        # If user is online via ids2 (exclusive), use whitelist 2
+                        # If user is online via ids (main/sec), use whitelist 1
+                        
+                        user_data = USER_STORE.get(user_id, {})
+                        is_ids2 = (user_data.get('status_ids2') == 'online' or 
+                                   user_data.get('secondary_status_ids2') == 'online')
+                        
+                        bad_word = WHITELISTS.validate(hb.opening, 2 if is_ids2 else 1)
+                        
+                        reason = None          
+                        if bad_word is not None:
+                            reason = f"Forbidden Pack: '{bad_word}' is not allowed."
+
+                    if reason:
+                        # BAN HAMMER
+                        # PRE-CHECK: Is user actually on the list?
+                        f_code = USER_STORE.get(user_id, {}).get('friend_code')
+                        s_code = USER_STORE.get(user_id, {}).get('secondary_code')
+                        
+                        if await is_user_publicly_online(f_code, s_code):
+                            print(f"🚫 POLICING BAN: {member.name} - {reason}", flush=True)
+                            USER_STORE.update(user_id, status='offline', secondary_status='offline',
+                                              status_ids2='offline', secondary_status_ids2='offline')
+                            USER_STORE.discard(user_id, 'last_heartbeat')
+                            await sync_to_github()
+                            await ROLES.reconcile(member)
+                            await update_channel_status(self) 
+                            try:
+                                # OPTIMIZATION: Try cache first
+                                checkin_ping_channel = self.get_channel(CHECKIN_PING_ID)
+                                if not checkin_ping_channel:
+                                    checkin_ping_channel = await self.fetch_channel(CHECKIN_PING_ID)
+                                    
+                                if checkin_ping_channel:
+                                    OUTBOUND.post(checkin_ping_channel, f"🚨 {member.mention} **has been automatically taken offline.**\n**Reason:** {reason}")
+                            except: pass
+                            print(f"ℹ️ Skipping Policing Ban for {member.name} (Not in public list) - Reason: {reason}", flush=True)
+                    else:
+                        # ALL GOOD (96P+)
+                        pass
+
+                else:
+                    # --- BRANCH: Other (Non-Policing) ---
+                    pass
+                    
+                # --- STATS TRACKING (All Types) ---
+                # FILTER: Skip stats tracking for "Inject 13P+"
+                # (We still forward it (earlier logic), but we don't track it in stats)
+                if hb.time is not None and not hb.inject_13p:
+                    # 1. Online Instances (Exclude "Main")
+                    instance_count = hb.instances
+
+                    # 2. Offline Instances
+                    offline_count = hb.offline_instances
+                    
+                    total_instances = instance_count + offline_count
+                    
+                    # 3. Offline Alert (State-based)
+                    # Logic: Alert ONCE per incident. Reset if count goes back to 0.
+                    has_alerted = USER_STORE.get(user_id, {}).get("has_alerted_offline", False)
+                    
+                    if offline_count > 0:
+                        if not has_alerted:
+                            try:
+                                alert_channel = self.get_channel(CHECKIN_PING_ID)
+                                if not alert_channel: alert_channel = await self.fetch_channel(CHECKIN_PING_ID)
+                                
+                                if alert_channel:
+                                    OUTBOUND.post(alert_channel, f"⚠️ {member.mention} **Attention:** You have **{offline_count}** offline instances! Please check your bots.")
+                                    # Marked when queued: heartbeats arriving before it goes out mustn't queue another
+                                    USER_STORE.update(user_id, has_alerted_offline=True)
+                            except Exception as e:
+                                print(f"Failed to send offline alert: {e}", flush=True)
+                    else:
+                        # Reset if back to 0 (allow alerting again for next incident)
+                        if has_alerted:
+                            USER_STORE.update(user_id, has_alerted_offline=False)
+
+                    # 4. Session Tracking
+                    now_ts = int(time.time())
+
+                    # --- SNAPSHOT COLLECTION ---
+                    # Store current state: [timestamp, packs]
+                    # (PACK_SAMPLES drops anything older than 25h as it goes)
+                    PACK_SAMPLES.append(user_id, now_ts, current_packs)
+
+                    # Update session state (for display/duration)
+                    USER_STORE.update(user_id, session={
+                         "current_packs": current_packs,
+                         "instances": instance_count,
+                         "offline_instances": offline_count,
+                         "total_instances": total_instances,
+                         "duration_minutes": current_time,
+                         "last_update": now_ts
+                    },
+                    # Update Legacy Last Heartbeat (for compatibility)
+                    last_heartbeat={'time': current_time, 'packs': current_packs})
+                    
+
+                # ALWAYS Forward (Routing logic)
+                try:
+                    # Determine target channel
+                    target_id = HEARTBEAT_MONITOR_ID
+                    u_data = USER_STORE.get(user_id, {})
+                    
+                    if (u_data.get('status_ids2') == 'online' or 
+                        u_data.get('secondary_status_ids2') == 'online'):
+                         target_id = HEARTBEAT_MONITOR_2_ID
+                    
+                    hb_channel = self.get_channel(target_id)
+                    if not hb_channel:
+                        hb_channel = await self.fetch_channel(target_id)
+                        
+                    forward_msg = f"{member.name}\n{message.content}"
+                    if hb_channel:
+                        def forwarded(sent, channel_id=hb_channel.id, name=member.name, hb=hb):
+                            # Already handled here; history scans can skip it
+                            HISTORY_CURSORS.advance(channel_id, sent.id)
+                            HEARTBEAT_FEED.record(channel_id, name, hb, sent.created_at.timestamp())
+                        OUTBOUND.post(hb_channel, forward_msg, batch=FORWARD_BATCHING, on_sent=forwarded)
+                except Exception as e:
+                        print(f"Failed to forward heartbeat: {e}", flush=True)
+
+        except Exception as e:
+            result = "error"
+            print(f"⚠️ Heartbeat Policing Error: {e}", flush=True)
+        finally:
+            metrics.HEARTBEATS.inc(result=result)
+            metrics.HEARTBEAT_SECONDS.observe(time.perf_counter() - started)
 
     async def on_message(self, message):
         # 1. VIP ID Extraction (Webhook Messages in Group Packs)
@@ -1451,8 +2597,8 @@ class MyBot(commands.Bot):
             match = re.search(r'\((\d{16})\)', message.content)
             if match:
                 vip_id = match.group(1)
-                print(f"🔍 Detected VIP ID: {vip_id}", flush=True)
-                await update_vip_list(vip_id)
+                if await VIP_LIST.add(vip_id):
+                    print(f"🔍 Detected VIP ID: {vip_id}", flush=True)
             
             # TRIAGE: If Webhook, Repost with Buttons
             if message.webhook_id:
@@ -1472,286 +2618,34 @@ class MyBot(commands.Bot):
                 return # Stop processing (we handled it)
 
         if message.channel.name.startswith("home-") and message.webhook_id:
+            hb = parse_heartbeat(message.content)
+
             # FILTER: Ignore Tradeable messages
-            if "Tradeable" in message.content:
+            if hb.tradeable:
                 return
 
-            print(f"DEBUG: Webhook message detected in {message.channel.name}", flush=True)
-            try:
-                # Identify Member by Presence in Private Channel (Robust against name changes/special chars)
-                # Filter out Bots
-                humans = [m for m in message.channel.members if not m.bot]
-                
-                # Filter out Admin "bk030" (unless they are the ONLY human)
-                candidates = [m for m in humans if m.name != "bk030"]
-                
-                member = None
-                if len(candidates) == 1:
-                    member = candidates[0]
-                elif len(candidates) == 0 and len(humans) > 0:
-                    # If candidates is empty but humans exist, it must be bk030 alone
-                    member = humans[0]
-                else:
-                    # Multiple candidates? Log it.
-                    if len(candidates) > 1:
-                        print(f"⚠️ Ambiguous Members in {message.channel.name}: {[m.name for m in candidates]}", flush=True)
-
-                print(f"DEBUG: Resolved Member via Presence: {member}", flush=True)
-
-                user_id = str(member.id) if member else None
-                data = load_data()
-                
-                in_db = user_id in data if user_id else False
-                print(f"DEBUG: User ID: {user_id} | In DB: {in_db}", flush=True)
-                
-                if user_id and user_id in data:
-                    print("DEBUG: Processing Heartbeat...", flush=True)
-                    content = message.content
-                    reason = None
-                    
-                    # --- PARSING ---
-                    # --- PARSING ---
-                    time_match = re.search(r"Time:\s*(\d+)m", content)
-                    packs_match = re.search(r"Packs:\s*(\d+)", content)
-                    opening_match = re.search(r"Opening:\s*(.+)", content) 
-                    
-                    current_time = int(time_match.group(1)) if time_match else 0
-                    current_packs = int(packs_match.group(1)) if packs_match else 0
-
-                    # --- BRANCH: Quiet Removal (13P+ / Create Bots) ---
-                    if "Type: Inject 13P+" in content or "Type: Create Bots (13P)" in content:
-                        # Check if actually on the list before removing
-                        f_code = data[user_id].get('friend_code')
-                        s_code = data[user_id].get('secondary_code')
-                        
-                        if await is_user_publicly_online(f_code, s_code):
-                            print(f"📉 Quiet Removal for {member.name} (Non-96P Type)", flush=True)
-                            data[user_id]['status'] = 'offline'
-                            data[user_id]['secondary_status'] = 'offline' 
-                            if 'last_heartbeat' in data[user_id]: del data[user_id]['last_heartbeat']
-                            await save_data_async(data)
-                            await sync_to_github(data)
-                            await manage_roles(member, 'offline')
-                            await update_channel_status(self)
-                        else:
-                            print(f"ℹ️ Skipping Quiet Removal for {member.name} (Not in public list)", flush=True)
-                        
-                        # We forward for log but stop processing
-                        
-                    # 3. God Pack Logging (Global Stats)
-                    elif message.channel.id == GOD_PACK_LOG_CHANNEL_ID:
-                        if "God Pack" in content:
-                            print(f"🌟 God Pack Detected via Log!", flush=True)
-                            data = load_data()
-                            current_day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-                             # Reset if new day
-                            if data["_global_stats"].get("last_reset_day") != current_day:
-                                 data["_global_stats"]["daily_god_packs"] = 0
-                                 data["_global_stats"]["last_reset_day"] = current_day
-                                 
-                            data["_global_stats"]["daily_god_packs"] += 1
-                            await save_data_async(data)
-                            await sync_to_github(data)
-                        return # Done
-
-                    # --- BRANCH: Strict Policing (Wonderpick 96P+ ONLY) ---
-                    elif "Type: Inject Wonderpick 96P+" in content:
-                        # --- RULE 2: "1P Method" ---
-                        if "1P Method" in content:
-                            reason = "Forbidden Strategy: 1P Method detected."
-                        
-                        # --- RULE 1: Stalling ---
-                        if not reason and time_match:
-                            last_stats = data[user_id].get('last_heartbeat', {})
-                            last_time = last_stats.get('time', 0)
-                            last_packs = last_stats.get('packs', 0)
-                            
-                            if last_time > 0 and (current_time - last_time) >= 25 and current_packs == last_packs:
-                                reason = f"Stalling Detected: Time passed ({current_time - last_time}m) but Packs did not increase."
-                                
-                        # --- RULE 3: Wrong Pack Type ---
-                        if not reason and opening_match:
-                            opening_str = opening_match.group(1).replace(",", " ").strip()
-                            # --- WHITELIST CHECK ---
-                            # Determine which whitelist applies
-                            # If user is online via ids2 (exclusive), use whitelist 2
-                            # If user is online via ids (main/sec), use whitelist 1
-                            
-                            user_data = data.get(user_id, {})
-                            is_ids2 = (user_data.get('status_ids2') == 'online' or 
-                                       user_data.get('secondary_status_ids2') == 'online')
-                            
-                            if is_ids2:
-                                 allowed_packs = load_whitelist2()
-                            else:
-                                 allowed_packs = load_whitelist()
-                            
-                            reason = None          
-                            found_words = [w for w in opening_str.split() if w]
-                            for word in found_words:
-                                if word not in allowed_packs:
-                                    reason = f"Forbidden Pack: '{word}' is not allowed."
-                                    break
-
-                        if reason:
-                            # BAN HAMMER
-                            # PRE-CHECK: Is user actually on the list?
-                            f_code = data[user_id].get('friend_code')
-                            s_code = data[user_id].get('secondary_code')
-                            
-                            if await is_user_publicly_online(f_code, s_code):
-                                print(f"🚫 POLICING BAN: {member.name} - {reason}", flush=True)
-                                data[user_id]['status'] = 'offline'
-                                data[user_id]['secondary_status'] = 'offline' 
-                                data[user_id]['status_ids2'] = 'offline'
-                                data[user_id]['secondary_status_ids2'] = 'offline' 
-                                if 'last_heartbeat' in data[user_id]: del data[user_id]['last_heartbeat']
-                                await save_data_async(data)
-                                await sync_to_github(data)
-                                await manage_roles(member, 'offline')
-                                await update_channel_status(self) 
-                                await manage_roles(member, 'offline')
-                                await update_channel_status(self) 
-                                try:
-                                    # OPTIMIZATION: Try cache first
-                                    checkin_ping_channel = self.get_channel(CHECKIN_PING_ID)
-                                    if not checkin_ping_channel:
-                                        checkin_ping_channel = await self.fetch_channel(CHECKIN_PING_ID)
-                                        
-                                    if checkin_ping_channel:
-                                        await checkin_ping_channel.send(f"🚨 {member.mention} **has been automatically taken offline.**\n**Reason:** {reason}")
-                                except: pass
-                                print(f"ℹ️ Skipping Policing Ban for {member.name} (Not in public list) - Reason: {reason}", flush=True)
-                        else:
-                            # ALL GOOD (96P+)
-                            pass
-
-                    else:
-                        # --- BRANCH: Other (Non-Policing) ---
-                        pass
-                        
-                    # --- STATS TRACKING (All Types) ---
-                    if time_match:
-                        # FILTER: Skip stats tracking for "Inject 13P+"
-                        if "Inject 13P+" in content:
-                           # We still forward it (earlier logic), but we don't track it in stats
-                           pass
-                        else:
-                            # 1. Parse Online Instances (Exclude "Main")
-                            online_line_match = re.search(r"Online:\s*(.+)", content, re.IGNORECASE)
-                        instance_count = 0
-                        if online_line_match:
-                            on_str = online_line_match.group(1).strip()
-                            if on_str.lower() != "none":
-                                # Exclude 'Main' (case insensitive) and count rest
-                                items = [x.strip() for x in on_str.split(',') if x.strip()]
-                                instance_count = len([x for x in items if x.lower() != "main"])
-
-                        # 2. Parse Offline Instances
-                        offline_line_match = re.search(r"Offline:\s*(.+)", content, re.IGNORECASE)
-                        offline_count = 0
-                        if offline_line_match:
-                            off_str = offline_line_match.group(1).strip()
-                            if off_str.lower() != "none":
-                                offline_count = len([x for x in off_str.split(',') if x.strip()])
-                        
-                        total_instances = instance_count + offline_count
-                        
-                        # 3. Offline Alert (State-based)
-                        # Logic: Alert ONCE per incident. Reset if count goes back to 0.
-                        has_alerted = data[user_id].get("has_alerted_offline", False)
-                        
-                        if offline_count > 0:
-                            if not has_alerted:
-                                try:
-                                    alert_channel = self.get_channel(CHECKIN_PING_ID)
-                                    if not alert_channel: alert_channel = await self.fetch_channel(CHECKIN_PING_ID)
-                                    
-                                    if alert_channel:
-                                        await alert_channel.send(f"⚠️ {member.mention} **Attention:** You have **{offline_count}** offline instances! Please check your bots.")
-                                        data[user_id]["has_alerted_offline"] = True
-                                        await save_data_async(data) # Save state immediately
-                                except Exception as e:
-                                    print(f"Failed to send offline alert: {e}", flush=True)
-                        else:
-                            # Reset if back to 0 (allow alerting again for next incident)
-                            if has_alerted:
-                                data[user_id]["has_alerted_offline"] = False
-                                await save_data_async(data)
-
-                        # 4. Session Tracking
-                        now_ts = int(time.time())
-                        user_data = data[user_id]
-                        if "session" not in user_data: user_data["session"] = {}
-                        if "samples" not in user_data: user_data["samples"] = [] # New: Snapshot Samples
-
-                        # --- SNAPSHOT COLLECTION ---
-                        # Store current state: [timestamp, packs]
-                        user_data["samples"].append([now_ts, current_packs])
-                        
-                        # Prune samples older than 25h (keep buffer for 24h calc)
-                        cutoff_prune = now_ts - 90000 
-                        if len(user_data["samples"]) > 100: # Optimize: Don't check every time if small
-                             user_data["samples"] = [s for s in user_data["samples"] if s[0] > cutoff_prune]
-
-                        # Update session state (for display/duration)
-                        user_data["session"] = {
-                             "current_packs": current_packs,
-                             "instances": instance_count,
-                             "offline_instances": offline_count,
-                             "total_instances": total_instances,
-                             "duration_minutes": current_time,
-                             "last_update": now_ts
-                        }
-                            
-                        # Update Last Seen for Session
-                        user_data["session"]["last_update"] = now_ts
-                        user_data["session"]["current_packs"] = current_packs
-                        
-                        # Update Legacy Last Heartbeat (for compatibility)
-                        data[user_id]['last_heartbeat'] = {'time': current_time, 'packs': current_packs}
-                        
-                        await save_data_async(data)
-
-                    # ALWAYS Forward (Routing logic)
-                    try:
-                        # Determine target channel
-                        target_id = HEARTBEAT_MONITOR_ID
-                        u_data = data.get(user_id, {})
-                        
-                        if (u_data.get('status_ids2') == 'online' or 
-                            u_data.get('secondary_status_ids2') == 'online'):
-                             target_id = HEARTBEAT_MONITOR_2_ID
-                        
-                        hb_channel = self.get_channel(target_id)
-                        if not hb_channel:
-                            hb_channel = await self.fetch_channel(target_id)
-                            
-                        forward_msg = f"{member.name}\n{content}"
-                        if hb_channel:
-                            await hb_channel.send(forward_msg)
-                    except Exception as e:
-                            print(f"Failed to forward heartbeat: {e}", flush=True)
-
-            except Exception as e:
-                print(f"⚠️ Heartbeat Policing Error: {e}", flush=True)
+            HEARTBEAT_INGEST.submit(message.channel.id, self.process_heartbeat, message, hb)
 
         if message.author == self.user:
             return
 
         # 2. Watermarking (Images in Godpacks Showcase)
         if message.channel.name == WATERMARK_CHANNEL_NAME and message.attachments:
-            processed_files = []
-            for attachment in message.attachments:
-                if attachment.content_type and "image" in attachment.content_type:
-                    try:
-                        image_bytes = await attachment.read()
-                        loop = asyncio.get_running_loop()
-                        watermarked_io = await loop.run_in_executor(None, add_watermark, image_bytes)
-                        if watermarked_io:
-                            processed_files.append(discord.File(fp=watermarked_io, filename=f"watermarked_{attachment.filename}"))
-                    except Exception as e:
-                        print(f"Failed to watermark attachment: {e}", flush=True)
+            async def watermark_attachment(attachment):
+                try:
+                    image_bytes = await attachment.read()
+                    data = await WATERMARK_POOL.submit(image_bytes, attachment.filename)
+                    if data:
+                        stem = os.path.splitext(attachment.filename)[0]
+                        return discord.File(fp=io.BytesIO(data), filename=f"watermarked_{stem}.{WATERMARK_POOL.extension}")
+                except Exception as e:
+                    print(f"Failed to watermark attachment: {e}", flush=True)
+                return None
+
+            # All images of the message render in parallel (attachment order is kept)
+            images = [a for a in message.attachments if a.content_type and "image" in a.content_type]
+            results = await asyncio.gather(*(watermark_attachment(a) for a in images))
+            processed_files = [f for f in results if f]
             
             if processed_files:
                 await message.channel.send(
@@ -1782,6 +2676,25 @@ async def sync(ctx):
         await bot.tree.sync()
         await ctx.send("Synced globally.")
 
+@bot.event
+async def on_member_remove(member):
+    HOME_CHANNELS.forget_user(member.id)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    HOME_CHANNELS.forget_channel(channel.id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    # Ownership follows channel permissions; re-resolve when they change
+    if not after.name.startswith("home-") or before.overwrites == after.overwrites:
+        return
+    member = resolve_home_owner(after)
+    if member:
+        HOME_CHANNELS.assign(after.id, member.id)
+    else:
+        HOME_CHANNELS.forget_channel(after.id)
+
 @bot.event
 async def on_member_join(member):
     guild = member.guild
@@ -1813,13 +2726,14 @@ async def on_member_join(member):
             f"You can use your personal webhook for tracking tradable cards."
         )
         await private_channel.send(setup_msg)
+        HOME_CHANNELS.assign(private_channel.id, member.id)
         print(f"Created channel for {member.name}", flush=True)
         
     except Exception as e:
         print(f"Error creating channel: {e}", flush=True)
 
     # 4. Assign Default Role (Not Rerolling)
-    await manage_roles(member, 'offline')
+    await ROLES.reconcile(member)
 
     checkin_channel = get_checkin_channel(guild)
     if checkin_channel:
@@ -1845,11 +2759,11 @@ async def rg_add_user(interaction: discord.Interaction, friend_code: str, instan
 
     await interaction.response.defer(ephemeral=False)
     user_id = str(interaction.user.id)
-    data = load_data()
+    user = USER_STORE.get(user_id)
 
-    if user_id in data:
-        current_code = data[user_id].get('friend_code', 'Not Set')
-        current_status = data[user_id].get('status', 'offline')
+    if user is not None:
+        current_code = user.get('friend_code', 'Not Set')
+        current_status = user.get('status', 'offline')
         await interaction.followup.send(
             f"❌ **You are already registered!**\n"
             f"• Friend Code: `{current_code}`\n"
@@ -1861,15 +2775,15 @@ async def rg_add_user(interaction: discord.Interaction, friend_code: str, instan
         )
         return
 
-    for existing_id, info in data.items():
-        if info.get('friend_code') == friend_code and existing_id != user_id:
-            await interaction.followup.send(
-                f"❌ **Error**: This Friend Code is already registered by another user.",
-                ephemeral=True
-            )
-            return
+    owner = USER_STORE.code_owner(friend_code)
+    if owner is not None and owner != user_id:
+        await interaction.followup.send(
+            f"❌ **Error**: This Friend Code is already registered by another user.",
+            ephemeral=True
+        )
+        return
 
-    data[user_id] = {
+    USER_STORE.create(user_id, {
         "username": interaction.user.name,
         "friend_code": friend_code,
         "secondary_code": None,
@@ -1878,10 +2792,9 @@ async def rg_add_user(interaction: discord.Interaction, friend_code: str, instan
         "status": "offline",
         "secondary_status": "offline",
         "status_ids2": "offline" # New: For ids2.txt specific status
-    }
-    await save_data_async(data)
+    })
 
-    await manage_roles(interaction.user, 'offline')
+    await ROLES.reconcile(interaction.user)
 
     await interaction.followup.send(
         f"✅ **Registered & Saved!**\n"
@@ -1900,20 +2813,16 @@ async def rg_add_secondary_id(interaction: discord.Interaction, friend_code: str
 
     await interaction.response.defer(ephemeral=False)
     user_id = str(interaction.user.id)
-    data = load_data()
     
-    if user_id not in data:
+    if user_id not in USER_STORE:
         await interaction.followup.send("❌ You are not registered! proper use: `/rg_add_user` first.", ephemeral=True)
         return
 
-    for uid, info in data.items():
-        if info.get('friend_code') == friend_code or info.get('secondary_code') == friend_code:
-             await interaction.followup.send("❌ This ID is already registered.", ephemeral=True)
-             return
+    if USER_STORE.code_owner(friend_code) is not None:
+        await interaction.followup.send("❌ This ID is already registered.", ephemeral=True)
+        return
 
-    data[user_id]['secondary_code'] = friend_code
-    data[user_id]['secondary_status'] = 'offline' 
-    await save_data_async(data)
+    USER_STORE.update(user_id, secondary_code=friend_code, secondary_status='offline')
     
     await interaction.followup.send(f"✅ **Secondary ID Added!**\nCode: `{friend_code}`\nRun `/rg_online_2nd` to activate it.")
 
@@ -1921,13 +2830,12 @@ async def rg_add_secondary_id(interaction: discord.Interaction, friend_code: str
 async def rg_unadd_user(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
     user_id = str(interaction.user.id)
-    data = load_data()
     
-    if user_id in data:
-        del data[user_id]
-        await save_data_async(data)
-        await sync_to_github(data)
-        await manage_roles(interaction.user, 'offline')
+    if user_id in USER_STORE:
+        USER_STORE.delete(user_id)
+        PACK_SAMPLES.discard(user_id)
+        await sync_to_github()
+        await ROLES.reconcile(interaction.user)
         await interaction.followup.send("🗑️ **Unregistered.** Your data has been wiped. You can now register a new ID.")
         await update_channel_status(interaction.client)
     else:
@@ -1945,26 +2853,24 @@ async def rg_change_id(interaction: discord.Interaction, new_code: str):
 
     await interaction.response.defer(ephemeral=False)
     user_id = str(interaction.user.id)
-    data = load_data()
     
-    if user_id not in data:
+    if user_id not in USER_STORE:
         await interaction.followup.send("❌ You are not registered! proper use: `/rg_add_user` first.", ephemeral=True)
         return
 
-    for existing_id, info in data.items():
-        if info.get('friend_code') == new_code and existing_id != user_id:
-            await interaction.followup.send(
-                f"❌ **Error**: This Friend Code is already registered by another user.",
-                ephemeral=True
-            )
-            return
+    owner = USER_STORE.code_owner(new_code)
+    if owner is not None and owner != user_id:
+        await interaction.followup.send(
+            f"❌ **Error**: This Friend Code is already registered by another user.",
+            ephemeral=True
+        )
+        return
 
-    old_code = data[user_id].get('friend_code')
-    data[user_id]['friend_code'] = new_code
-    await save_data_async(data)
+    old_code = USER_STORE.get(user_id).get('friend_code')
+    user = USER_STORE.update(user_id, friend_code=new_code)
     
-    if data[user_id].get('status') == 'online':
-        await sync_to_github(data)
+    if user.get('status') == 'online':
+        await sync_to_github()
         
     await interaction.followup.send(
         f"✅ **ID Updated!**\n"
@@ -1981,56 +2887,40 @@ async def rg_online(interaction: discord.Interaction):
         return
 
     user_id = str(interaction.user.id)
-    data = load_data()
+    user = USER_STORE.get(user_id)
     
-    if user_id not in data:
+    if user is None:
         await interaction.followup.send("❌ You are not registered! proper use: `/rg_add_user` first.", ephemeral=True)
         return
 
-    if data[user_id].get('status') == 'online':
+    if user.get('status') == 'online':
         await interaction.followup.send("⚠️ **Already Online!** You are already in the queue.", ephemeral=True)
         return
     
-    if data[user_id].get('status_ids2') == 'online':
+    if user.get('status_ids2') == 'online':
         await interaction.followup.send("❌ **Exclusivity Error:** You are currently online on `ids2.txt`.\nYou must go `/rg_offline` first before switching lists.", ephemeral=True)
         return
 
-    data[user_id]['status'] = 'online'
-    await save_data_async(data)
-    await sync_to_github(data)
+    user = USER_STORE.update(user_id, status='online')
+    await sync_to_github()
 
     msg = await interaction.followup.send(f"⏳ **Verifying accessibility...** (Checking https://arwin.de/ids.txt)")
     
-    verified = False
-    friend_code = data[user_id]['friend_code']
-    
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=4)) as session:
-            for i in range(36):
-                print(f"🔍 Verification Attempt {i+1}/36 for {friend_code}", flush=True)
-                try:
-                    async with session.get(f"https://arwin.de/ids.txt?t={int(datetime.now().timestamp())}") as response:
-                        if response.status == 200:
-                            text = await response.text()
-                            if friend_code in text:
-                                verified = True
-                                break
-                except Exception as e:
-                    print(f"Verification Check Failed (Attempt {i+1}): {e}", flush=True)
-                
-                await asyncio.sleep(5)
-    except Exception as e:
-        print(f"Session Error: {e}", flush=True)
-    
-    try:
-        if verified:
-            await msg.edit(content=f"🟢 **Online!** {interaction.user.mention} is now accepting friend requests.\n✅ **Verified:** Your ID is visible on the public list.")
-            await manage_roles(interaction.user, 'online')
-            await update_channel_status(interaction.client)
-        else:
-            await msg.edit(content=f"⚠️ **Pushed directly to GitHub**, but `arwin.de` is taking a while to update.\nYour ID *will* appear shortly. (Timed out after 3m)")
-    except Exception as e:
-         print(f"Failed to edit message: {e}", flush=True)
+    friend_code = user['friend_code']
+    print(f"🔍 Waiting for {friend_code} on ids.txt", flush=True)
+
+    async def report(verified):
+        try:
+            if verified:
+                await msg.edit(content=f"🟢 **Online!** {interaction.user.mention} is now accepting friend requests.\n✅ **Verified:** Your ID is visible on the public list.")
+                await ROLES.reconcile(interaction.user)
+                await update_channel_status(interaction.client)
+            else:
+                await msg.edit(content=f"⚠️ **Pushed directly to GitHub**, but `arwin.de` is taking a while to update.\nYour ID *will* appear shortly. (Timed out after 3m)")
+        except Exception as e:
+             print(f"Failed to edit message: {e}", flush=True)
+
+    PUBLISH_VERIFIER.watch("https://arwin.de/ids.txt", friend_code, report)
 
 @bot.tree.command(name="rg_online2", description="Set your ID to ONLINE exclusively on ids2.txt (Bot 2)")
 async def rg_online2(interaction: discord.Interaction):
@@ -2039,56 +2929,42 @@ async def rg_online2(interaction: discord.Interaction):
     except: return
 
     user_id = str(interaction.user.id)
-    data = load_data()
+    user = USER_STORE.get(user_id)
     
-    if user_id not in data:
+    if user is None:
         await interaction.followup.send("❌ Not registered! Use `/rg_add_user` first.", ephemeral=True)
         return
         
     # Check Exclusivity (Must not be on Main list)
-    if data[user_id].get('status') == 'online' or data[user_id].get('secondary_status') == 'online':
+    if user.get('status') == 'online' or user.get('secondary_status') == 'online':
         await interaction.followup.send("❌ **Exclusivity Error:** You are currently online on `ids.txt` (Main).\nYou must go `/rg_offline` first before switching lists.", ephemeral=True)
         return
 
     # Set status_ids2
-    if data[user_id].get('status_ids2') == 'online':
+    if user.get('status_ids2') == 'online':
         await interaction.followup.send("⚠️ **Already on ids2!**", ephemeral=True)
         return
 
-    data[user_id]['status_ids2'] = 'online'
-    await save_data_async(data)
-    await sync_to_github(data)
+    user = USER_STORE.update(user_id, status_ids2='online')
+    await sync_to_github()
     
     # Verify on ids2.txt
     msg = await interaction.followup.send(f"⏳ **Verifying accessibility on ids2.txt...**")
     
-    verified = False
-    friend_code = data[user_id]['friend_code']
+    friend_code = user['friend_code']
     
     # Verification Logic (Checking ids2.txt)
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=4)) as session:
-            for i in range(36): 
-                try:
-                    # Check ids2.txt
-                    async with session.get(f"https://arwin.de/ids2.txt?t={int(datetime.now().timestamp())}") as response:
-                        if response.status == 200:
-                            text = await response.text()
-                            if friend_code in text:
-                                verified = True
-                                break
-                except: pass
-                await asyncio.sleep(5)
-    except: pass
-    
-    try:
-        if verified:
-            await msg.edit(content=f"🟢 **Online (Bot 2 Exclusive)!** {interaction.user.mention} is now on `ids2.txt`.")
-            await manage_roles(interaction.user, 'online')
-            await update_channel_status(interaction.client)
-        else:
-            await msg.edit(content=f"⚠️ **Pushed to ids2.txt**, but verification timed out.")
-    except: pass
+    async def report(verified):
+        try:
+            if verified:
+                await msg.edit(content=f"🟢 **Online (Bot 2 Exclusive)!** {interaction.user.mention} is now on `ids2.txt`.")
+                await ROLES.reconcile(interaction.user)
+                await update_channel_status(interaction.client)
+            else:
+                await msg.edit(content=f"⚠️ **Pushed to ids2.txt**, but verification timed out.")
+        except: pass
+
+    PUBLISH_VERIFIER.watch("https://arwin.de/ids2.txt", friend_code, report)
 
 @bot.tree.command(name="rg_online2_2nd", description="Set your SECONDARY ID to ONLINE on ids2.txt (Bot 2)")
 async def rg_online2_2nd(interaction: discord.Interaction):
@@ -2097,50 +2973,37 @@ async def rg_online2_2nd(interaction: discord.Interaction):
     except: return
 
     user_id = str(interaction.user.id)
-    data = load_data()
+    user = USER_STORE.get(user_id)
     
-    if user_id not in data or not data[user_id].get('secondary_code'):
+    if user is None or not user.get('secondary_code'):
         await interaction.followup.send("❌ **No Secondary ID found!** Use `/rg_add_secondary_id` first.", ephemeral=True)
         return
 
     # Check Exclusivity (Must not be on Main list)
-    if data[user_id].get('status') == 'online' or data[user_id].get('secondary_status') == 'online':
+    if user.get('status') == 'online' or user.get('secondary_status') == 'online':
         await interaction.followup.send("❌ **Exclusivity Error:** You are currently online on `ids.txt` (Main).\nYou must go `/rg_offline` first before switching lists.", ephemeral=True)
         return
 
-    if data[user_id].get('secondary_status_ids2') == 'online':
+    if user.get('secondary_status_ids2') == 'online':
         await interaction.followup.send("⚠️ **Secondary ID Already Online on List 2!**", ephemeral=True)
         return
 
-    data[user_id]['secondary_status_ids2'] = 'online'
-    await save_data_async(data)
-    await sync_to_github(data)
+    user = USER_STORE.update(user_id, secondary_status_ids2='online')
+    await sync_to_github()
     
     msg = await interaction.followup.send(f"⏳ **Verifying 2nd ID on ids2.txt...**")
     
-    verified = False
-    sec_code = data[user_id]['secondary_code']
-    
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=4)) as session:
-            for i in range(36): 
-                try:
-                    async with session.get(f"https://arwin.de/ids2.txt?t={int(datetime.now().timestamp())}") as response:
-                        if response.status == 200:
-                            text = await response.text()
-                            if sec_code in text:
-                                verified = True
-                                break
-                except: pass
-                await asyncio.sleep(5)
-    except: pass
+    sec_code = user['secondary_code']
     
-    if verified:
-        await msg.edit(content=f"🟢 **Secondary ID Online (Bot 2)!** `{sec_code}` is live.")
-        await manage_roles(interaction.user, 'online') 
-        await update_channel_status(interaction.client)
-    else:
-        await msg.edit(content=f"⚠️ **Pushed 2nd ID to List 2**, but verification timed out.")
+    async def report(verified):
+        if verified:
+            await msg.edit(content=f"🟢 **Secondary ID Online (Bot 2)!** `{sec_code}` is live.")
+            await ROLES.reconcile(interaction.user) 
+            await update_channel_status(interaction.client)
+        else:
+            await msg.edit(content=f"⚠️ **Pushed 2nd ID to List 2**, but verification timed out.")
+
+    PUBLISH_VERIFIER.watch("https://arwin.de/ids2.txt", sec_code, report)
 
 @bot.tree.command(name="rg_online_2nd", description="Set your SECONDARY ID to ONLINE")
 async def rg_online_2nd(interaction: discord.Interaction):
@@ -2149,73 +3012,57 @@ async def rg_online_2nd(interaction: discord.Interaction):
     except: return
 
     user_id = str(interaction.user.id)
-    data = load_data()
+    user = USER_STORE.get(user_id)
     
-    if user_id not in data or not data[user_id].get('secondary_code'):
+    if user is None or not user.get('secondary_code'):
         await interaction.followup.send("❌ **No Secondary ID found!** Use `/rg_add_secondary_id` first.", ephemeral=True)
         return
 
-    if data[user_id].get('secondary_status') == 'online':
+    if user.get('secondary_status') == 'online':
         await interaction.followup.send("⚠️ **Secondary ID Already Online!**", ephemeral=True)
         return
 
-    if data[user_id].get('status_ids2') == 'online':
+    if user.get('status_ids2') == 'online':
         await interaction.followup.send("❌ **Exclusivity Error:** You are currently online on `ids2.txt`.\nYou must go `/rg_offline` first before switching lists.", ephemeral=True)
         return
 
-    data[user_id]['secondary_status'] = 'online'
-    await save_data_async(data)
-    await sync_to_github(data)
+    user = USER_STORE.update(user_id, secondary_status='online')
+    await sync_to_github()
     
     msg = await interaction.followup.send(f"⏳ **Verifying 2nd ID accessibility...**")
     
-    verified = False
-    sec_code = data[user_id]['secondary_code']
-    
-    try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=4)) as session:
-            for i in range(36): 
-                try:
-                    async with session.get(f"https://arwin.de/ids.txt?t={int(datetime.now().timestamp())}") as response:
-                        if response.status == 200:
-                            text = await response.text()
-                            if sec_code in text:
-                                verified = True
-                                break
-                except: pass
-                await asyncio.sleep(5)
-    except: pass
+    sec_code = user['secondary_code']
     
-    if verified:
-        await msg.edit(content=f"🟢 **Secondary ID Online!** `{sec_code}` is live.")
-        await manage_roles(interaction.user, 'online') 
-        await update_channel_status(interaction.client)
-    else:
-        await msg.edit(content=f"⚠️ **Pushed 2nd ID**, but verification timed out. It should appear shortly.")
+    async def report(verified):
+        if verified:
+            await msg.edit(content=f"🟢 **Secondary ID Online!** `{sec_code}` is live.")
+            await ROLES.reconcile(interaction.user) 
+            await update_channel_status(interaction.client)
+        else:
+            await msg.edit(content=f"⚠️ **Pushed 2nd ID**, but verification timed out. It should appear shortly.")
+
+    PUBLISH_VERIFIER.watch("https://arwin.de/ids.txt", sec_code, report)
 
 @bot.tree.command(name="rg_offline", description="Set ALL your IDs to OFFLINE")
 async def rg_offline(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
 
     user_id = str(interaction.user.id)
-    data = load_data()
+    user = USER_STORE.get(user_id)
     
-    if user_id in data:
-        if (data[user_id].get('status') == 'offline' and 
-            data[user_id].get('secondary_status') == 'offline' and 
-            data[user_id].get('status_ids2') == 'offline' and
-            data[user_id].get('secondary_status_ids2') == 'offline'):
+    if user is not None:
+        if (user.get('status') == 'offline' and 
+            user.get('secondary_status') == 'offline' and 
+            user.get('status_ids2') == 'offline' and
+            user.get('secondary_status_ids2') == 'offline'):
              await interaction.followup.send("⚠️ **Already Offline!**", ephemeral=True)
              return
 
-        data[user_id]['status'] = 'offline'
-        data[user_id]['secondary_status'] = 'offline'
-        data[user_id]['status_ids2'] = 'offline'
-        data[user_id]['secondary_status_ids2'] = 'offline' # Reset All
-        await save_data_async(data)
-        await sync_to_github(data)
+        USER_STORE.update(user_id, status='offline', secondary_status='offline',
+                          status_ids2='offline', secondary_status_ids2='offline') # Reset All
+        await sync_to_github()
         
-        await manage_roles(interaction.user, 'offline')
+        await ROLES.reconcile(interaction.user)
         await update_channel_status(interaction.client)
         
         await interaction.followup.send(f"🔴 **Offline!** {interaction.user.mention} removed from ALL lists (`ids.txt` & `ids2.txt`).")
@@ -2228,23 +3075,18 @@ async def rg_offline(interaction: discord.Interaction):
 async def rg_remove_id(interaction: discord.Interaction, friend_code: str):
     await interaction.response.defer(ephemeral=False)
 
-    data = load_data()
-    found_user_id = None
-    
-    for user_id, info in data.items():
-        if info.get('friend_code') == friend_code:
-            found_user_id = user_id
-            break
+    found_user_id = USER_STORE.code_owner(friend_code)
+    if found_user_id and USER_STORE.get(found_user_id, {}).get('friend_code') != friend_code:
+        # Only primary IDs are removed here; a code duplicated in users.json may be indexed to its secondary holder
+        found_user_id = next((user_id for user_id, info in USER_STORE.users() if info.get('friend_code') == friend_code), None)
     
     if found_user_id:
-        data[found_user_id]['friend_code'] = None
-        data[found_user_id]['status'] = 'offline'
-        await save_data_async(data)
-        await sync_to_github(data)
+        USER_STORE.update(found_user_id, friend_code=None, status='offline')
+        await sync_to_github()
         
         member = interaction.guild.get_member(int(found_user_id))
         if member:
-            await manage_roles(member, 'offline')
+            await ROLES.reconcile(member)
         
         await interaction.followup.send(f"🗑️ Removed ID `{friend_code}` from the list and set user to Offline.")
         await update_channel_status(interaction.client)
@@ -2258,20 +3100,14 @@ async def rg_tempban(interaction: discord.Interaction, member: discord.Member):
     await interaction.response.defer(ephemeral=False)
 
     expiry_time = datetime.now() + timedelta(hours=48)
-    data = load_data()
     user_id = str(member.id)
-    if user_id not in data:
-         data[user_id] = {}
-    
-    data[user_id]["ban_expiry"] = expiry_time.isoformat()
-    if data[user_id].get('status') == 'online':
-        data[user_id]['status'] = 'offline'
-        data[user_id]['secondary_status'] = 'offline'
-        await sync_to_github(data)
-        await manage_roles(member, 'offline')
+    user = USER_STORE.update(user_id, ban_expiry=expiry_time.isoformat())
+    if user.get('status') == 'online':
+        USER_STORE.update(user_id, status='offline', secondary_status='offline')
+        await sync_to_github()
+        await ROLES.reconcile(member)
         await update_channel_status(interaction.client)
     
-    await save_data_async(data)
     
     channel = get_checkin_channel(member.guild)
     if channel:
@@ -2302,14 +3138,12 @@ async def rg_update_bot(interaction: discord.Interaction, file: discord.Attachme
         file_path = "bot.py"
         
         def _blocking_update_bot_file():
-            auth = Auth.Token(GITHUB_TOKEN)
-            g = Github(auth=auth)
-            repo = g.get_repo(REPO_NAME)
-            contents = repo.get_contents(file_path)
-            repo.update_file(contents.path, f"Bot: Remote Update by {interaction.user.name}", content, contents.sha)
+            GITHUB_SYNC.stage(file_path, content)
+            if not GITHUB_SYNC.flush(f"Bot: Remote Update by {interaction.user.name}"):
+                raise Exception("GitHub push failed (or file unchanged)")
 
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, _blocking_update_bot_file)
+        await loop.run_in_executor(GITHUB_EXECUTOR, _blocking_update_bot_file)
         
         await interaction.followup.send("✅ **Update Pushed!** Render should restart the bot automatically in ~1 minute.")
     except Exception as e:
@@ -2325,38 +3159,21 @@ async def rg_remove_vip(interaction: discord.Interaction, vip_id: str):
         
     await interaction.response.defer(ephemeral=False)
     
-    def _blocking_remove_vip_id():
-        if not GITHUB_TOKEN: return False, "No GitHub Token"
-        try:
-            auth = Auth.Token(GITHUB_TOKEN)
-            g = Github(auth=auth)
-            repo = g.get_repo(REPO_NAME)
-            
-            try:
-                contents = repo.get_contents("vip_ids.txt")
-                file_sha = contents.sha
-                existing_text = contents.decoded_content.decode()
-                ids = set(existing_text.splitlines())
-                
-                if vip_id in ids:
-                    ids.remove(vip_id)
-                    new_content = "\n".join(sorted(list(ids)))
-                    repo.update_file("vip_ids.txt", "[skip ci] [skip render] Bot: Remove VIP ID", new_content, file_sha)
-                    return True, "Removed"
-                else:
-                    return False, "ID not found in list"
-            except Exception as e:
-                return False, str(e)
-        except Exception as e:
-            return False, str(e)
+    if not GITHUB_TOKEN:
+        await interaction.followup.send("❌ Failed: No GitHub Token", ephemeral=True)
+        return
+    if not await VIP_LIST.load():
+        await interaction.followup.send(f"❌ Failed: {VIP_FILE} could not be loaded", ephemeral=True)
+        return
+    if not await VIP_LIST.remove(vip_id):
+        await interaction.followup.send("❌ Failed: ID not found in list", ephemeral=True)
+        return
 
-    loop = asyncio.get_running_loop()
-    success, msg = await loop.run_in_executor(None, _blocking_remove_vip_id)
-    
-    if success:
+    # Publish now (together with any detections still waiting for their window)
+    if await VIP_LIST.publish():
         await interaction.followup.send(f"🗑️ **VIP ID Removed!** `{vip_id}` is gone.")
     else:
-        await interaction.followup.send(f"❌ Failed: {msg}", ephemeral=True)
+        await interaction.followup.send("⚠️ **VIP ID Removed** locally, but the GitHub push failed. It will be retried automatically.", ephemeral=True)
 
 @bot.tree.command(name="rg_startingtime", description="[Admin] Set the daily start time channel name")
 @app_commands.describe(time="The time to display (e.g. 14:30)")
@@ -2392,8 +3209,11 @@ async def rg_startingtime(interaction: discord.Interaction, time: str):
     try:
         if target_channel:
             if target_channel.name != channel_name:
-                await target_channel.edit(name=channel_name)
-                await interaction.followup.send(f"✅ Updated channel to: {target_channel.mention}")
+                wait = RENAMES.request(target_channel, channel_name)
+                if wait > 0:
+                    await interaction.followup.send(f"⏳ Discord limits channel renames; {target_channel.mention} will become `{channel_name}` in ~{int(wait // 60) + 1}m")
+                else:
+                    await interaction.followup.send(f"✅ Updated channel to: {target_channel.mention}")
             else:
                 await interaction.followup.send(f"⚠️ Channel is already named {target_channel.mention}")
         else:
@@ -2417,13 +3237,12 @@ async def admin_error(interaction: discord.Interaction, error):
 async def rg_whitelist_add(interaction: discord.Interaction, pack_name: str):
     await interaction.response.defer(ephemeral=False)
     
-    current_list = load_whitelist()
+    current_list = WHITELISTS.get(1)
     if pack_name in current_list:
         await interaction.followup.send(f"⚠️ `{pack_name}` is already in the whitelist.")
         return
 
-    current_list.append(pack_name)
-    await save_whitelist_async(current_list)
+    await save_whitelist_async(current_list | {pack_name})
     await interaction.followup.send(f"✅ Added `{pack_name}` to whitelist.")
 
 @bot.tree.command(name="rg_whitelist_remove", description="[Admin] Remove a pack name from the allowed whitelist")
@@ -2432,18 +3251,17 @@ async def rg_whitelist_add(interaction: discord.Interaction, pack_name: str):
 async def rg_whitelist_remove(interaction: discord.Interaction, pack_name: str):
     await interaction.response.defer(ephemeral=False)
     
-    current_list = load_whitelist()
+    current_list = WHITELISTS.get(1)
     if pack_name not in current_list:
         await interaction.followup.send(f"⚠️ `{pack_name}` is not in the whitelist.")
         return
 
-    current_list.remove(pack_name)
-    await save_whitelist_async(current_list)
+    await save_whitelist_async(current_list - {pack_name})
     await interaction.followup.send(f"🗑️ Removed `{pack_name}` from whitelist.")
 
 @bot.tree.command(name="rg_whitelist_list", description="Show all allowed packs")
 async def rg_whitelist_list(interaction: discord.Interaction):
-    current_list = load_whitelist()
+    current_list = WHITELISTS.get(1)
     formatted = "\n".join([f"• {item}" for item in sorted(current_list)])
     await interaction.response.send_message(f"📜 **Allowed Packs Whitelist:**\n\n{formatted}")
 
@@ -2454,12 +3272,11 @@ async def rg_whitelist_list(interaction: discord.Interaction):
 @app_commands.checks.has_permissions(manage_messages=True)
 async def rg_whitelist2_add(interaction: discord.Interaction, pack_name: str):
     await interaction.response.defer(ephemeral=False)
-    allowed = load_whitelist2()
+    allowed = WHITELISTS.get(2)
     if pack_name in allowed:
         await interaction.followup.send(f"⚠️ '{pack_name}' is already in Whitelist 2.")
         return
-    allowed.append(pack_name)
-    await save_whitelist2_async(allowed)
+    await save_whitelist2_async(allowed | {pack_name})
     await interaction.followup.send(f"✅ Added '{pack_name}' to Whitelist 2.")
 
 @bot.tree.command(name="rg_whitelist2_remove", description="[Admin] Remove a pack name from Whitelist 2")
@@ -2467,17 +3284,16 @@ async def rg_whitelist2_add(interaction: discord.Interaction, pack_name: str):
 @app_commands.checks.has_permissions(manage_messages=True)
 async def rg_whitelist2_remove(interaction: discord.Interaction, pack_name: str):
     await interaction.response.defer(ephemeral=False)
-    allowed = load_whitelist2()
+    allowed = WHITELISTS.get(2)
     if pack_name not in allowed:
         await interaction.followup.send(f"⚠️ '{pack_name}' not found in Whitelist 2.")
         return
-    allowed.remove(pack_name)
-    await save_whitelist2_async(allowed)
+    await save_whitelist2_async(allowed - {pack_name})
     await interaction.followup.send(f"🗑️ Removed '{pack_name}' from Whitelist 2.")
 
 @bot.tree.command(name="rg_whitelist2_list", description="Show all allowed packs for Whitelist 2")
 async def rg_whitelist2_list(interaction: discord.Interaction):
-    allowed = load_whitelist2()
+    allowed = WHITELISTS.get(2)
     formatted = "\n".join([f"• {item}" for item in sorted(allowed)])
     await interaction.response.send_message(f"📜 **Allowed Packs (Whitelist 2):**\n\n{formatted}")
 
@@ -2507,6 +3323,7 @@ async def rg_create_home(interaction: discord.Interaction, member: discord.Membe
     
     try:
         channel = await guild.create_text_channel(channel_name, category=category, overwrites=overwrites)
+        HOME_CHANNELS.assign(channel.id, member.id)
         await channel.send(f"👋 Welcome {member.mention}!\n\nThis is your **Personal Home Channel**.\n1. Go to Channel Settings -> Integrations -> Webhooks.\n2. Create a Webhook.\n3. Copy the Webhook URL and paste it into your device's script settings.\n\nOnly YOU and the Bot can see this channel.")
         await interaction.followup.send(f"✅ Created {channel.mention} for {member.name}.")
     except Exception as e:
@@ -2528,4 +3345,5 @@ if __name__ == "__main__":
     if TOKEN == "PASTE_YOUR_TOKEN_HERE":
         print("ERROR: Please put your bot token in the bot.py file on line 6.", flush=True)
     else:
+        WATERMARK_POOL.start() # Fork the workers before bot.run() starts the event loop and threads
         bot.run(TOKEN)
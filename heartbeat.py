@@ -0,0 +1,180 @@
+"""Parser for the heartbeat messages the reroll bots post through webhooks.
+
+A heartbeat looks like:
+
+    Online: Main, 1, 2, 3
+    Offline: none
+    Time: 64m | Packs: 212 | Avg: 3.31 packs/min
+    Type: Inject Wonderpick 96P+
+    Opening: MegaGyarados, MegaBlaziken
+
+When the bot forwards one to a monitor channel it prefixes the member name as
+an extra first line (see parse_forwarded_heartbeat). Several forwarded
+heartbeats may share one monitor message, separated by FORWARD_SEPARATOR
+(see split_forwarded).
+"""
+import re
+
+FORWARD_SEPARATOR = "\n────────\n"
+
+# A heartbeat in the usual layout is matched whole, in one scan. Messages with
+# lines missing or in another order fall back to picking out each "Key: value"
+# line with _FIELDS (still one scan) and the stats parts with the rest.
+_HEARTBEAT = re.compile(
+    r"^Online:[ \t]*(.*)\n"
+    r"Offline:[ \t]*(.*)\n"
+    r"Time:[ \t]*(\d+)m[ \t]*\|[ \t]*Packs:[ \t]*(\d+)[ \t]*\|[ \t]*Avg:[ \t]*([\d\.]+)[ \t]*packs/min\n"
+    r"Type:[ \t]*(.*)\n"
+    r"Opening:[ \t]*(.*)", re.MULTILINE)
+_FIELDS = re.compile(r"^(Time|Type|Opening|(?i:Online|Offline)):[ \t]*(.*)", re.MULTILINE)
+_TIME = re.compile(r"Time:\s*(\d+)m")
+_PACKS = re.compile(r"Packs:\s*(\d+)")
+_AVG = re.compile(r"Avg:\s*([\d\.]+)\s*packs/min")
+
+
+def _search(pattern, text):
+    match = pattern.search(text)
+    return match.group(1) if match else None
+
+
+def _instances(value):
+    value = value.strip() if value else ""
+    if not value or value.lower() == "none":
+        return ()
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+class Heartbeat:
+    """One heartbeat message. Missing numeric fields are None.
+
+    Reading any field parses the whole message in one pass; the type checks
+    below are substring tests and don't parse.
+    """
+    __slots__ = ("name", "text", "_parsed", "_time", "_packs", "_avg_ppm", "_type", "_opening", "_online", "_offline")
+
+    def __init__(self, text, name=None):
+        self.name = name
+        self.text = text
+        self._parsed = False
+
+    def _parse(self):
+        text = self.text
+        match = _HEARTBEAT.search(text)
+        if match:
+            online, offline, time, packs, avg, hb_type, opening = match.groups()
+        else:
+            fields = dict(reversed(_FIELDS.findall(text))) # First occurrence of a key wins
+            online = fields.get("Online") or fields.get("online")
+            offline = fields.get("Offline") or fields.get("offline")
+            hb_type, opening = fields.get("Type"), fields.get("Opening")
+            time, packs, avg = _search(_TIME, text), _search(_PACKS, text), _search(_AVG, text)
+        self._time = int(time) if time else None
+        self._packs = int(packs) if packs else None
+        try: self._avg_ppm = float(avg) if avg else None
+        except ValueError: self._avg_ppm = None
+        self._type = hb_type.strip() if hb_type else ""
+        # Lists are split on first use; the history scans never read them
+        self._opening, self._online, self._offline = opening, online, offline
+        self._parsed = True
+
+    @property
+    def time(self):
+        if not self._parsed: self._parse()
+        return self._time
+
+    @property
+    def packs(self):
+        if not self._parsed: self._parse()
+        return self._packs
+
+    @property
+    def avg_ppm(self):
+        if not self._parsed: self._parse()
+        return self._avg_ppm
+
+    @property
+    def type(self):
+        """Text after "Type:", or "" if there is none."""
+        if not self._parsed: self._parse()
+        return self._type
+
+    @property
+    def opening(self):
+        """Words on the Opening: line, or None if there is none."""
+        if not self._parsed: self._parse()
+        if isinstance(self._opening, str):
+            self._opening = tuple(self._opening.replace(",", " ").split())
+        return self._opening
+
+    @property
+    def online(self):
+        if not self._parsed: self._parse()
+        if not isinstance(self._online, tuple): self._online = _instances(self._online)
+        return self._online
+
+    @property
+    def offline(self):
+        if not self._parsed: self._parse()
+        if not isinstance(self._offline, tuple): self._offline = _instances(self._offline)
+        return self._offline
+
+    @property
+    def instances(self):
+        """Online instances, not counting "Main"."""
+        return sum(1 for item in self.online if item.lower() != "main")
+
+    @property
+    def offline_instances(self):
+        return len(self.offline)
+
+    # Type checks match the literal "Type: ..." text; cheaper than parsing the field
+    @property
+    def is_wonderpick(self):
+        return "Type: Inject Wonderpick" in self.text
+
+    @property
+    def is_96p(self):
+        return "Type: Inject Wonderpick 96P+" in self.text
+
+    @property
+    def is_quiet_removal(self):
+        """13P+ / Create Bots runs take the user off the list without a ban."""
+        return "Type: Inject 13P+" in self.text or "Type: Create Bots (13P)" in self.text
+
+    @property
+    def tradeable(self):
+        return "Tradeable" in self.text
+
+    @property
+    def one_p_method(self):
+        return "1P Method" in self.text
+
+    @property
+    def god_pack(self):
+        return "God Pack" in self.text
+
+    @property
+    def inject_13p(self):
+        return "Inject 13P+" in self.text
+
+
+def parse_heartbeat(text):
+    return Heartbeat(text)
+
+
+def parse_forwarded_heartbeat(text):
+    """Parse a "MemberName\\n<heartbeat>" message; None if there is no body."""
+    name, sep, body = text.partition("\n")
+    if not sep or not body:
+        return None
+    return Heartbeat(body, name.strip())
+
+
+def split_forwarded(text):
+    """Parse every forwarded heartbeat in a (possibly batched) monitor message."""
+    heartbeats = []
+    for part in text.split(FORWARD_SEPARATOR):
+        hb = parse_forwarded_heartbeat(part)
+        if hb is not None:
+            heartbeats.append(hb)
+    return heartbeats
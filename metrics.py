@@ -0,0 +1,171 @@
+"""In-process counters, gauges and latency histograms for the bot.
+
+Metrics are created once at import time on the module-level REGISTRY and
+updated from the hot paths (event loop and worker threads alike). The aiohttp
+server renders them at /metrics in the Prometheus text exposition format:
+
+    arwin_heartbeat_seconds_bucket{le="0.005"} 812
+    arwin_heartbeat_seconds_sum 1.93
+    arwin_heartbeat_seconds_count 815
+
+Label values are passed as keyword arguments, e.g. counter.inc(result="ok").
+"""
+import bisect
+import threading
+
+# Seconds; spans a cached dict lookup up to a slow GitHub commit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down. set_function() reads it at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """function() returns a number, or a {label dict as tuple: number} mapping."""
+        self._function = function
+
+    def render(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                value = None
+            with self._lock:
+                if isinstance(value, dict):
+                    self._values = {self._key(dict(k)): v for k, v in value.items()}
+                elif value is not None:
+                    self._values = {(): value}
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self._add(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self._add(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HEARTBEAT_SECONDS = REGISTRY.histogram("arwin_heartbeat_seconds", "Time to handle one heartbeat webhook message")
+HEARTBEATS = REGISTRY.counter("arwin_heartbeats_total", "Heartbeat webhook messages handled, by result")
+HEARTBEAT_QUEUE_SECONDS = REGISTRY.histogram("arwin_heartbeat_queue_seconds", "Time a heartbeat waited in the ingest queue")
+HEARTBEAT_QUEUE_DEPTH = REGISTRY.gauge("arwin_heartbeat_queue_depth", "Heartbeats waiting or being handled")
+HEARTBEAT_DROPPED = REGISTRY.counter("arwin_heartbeat_dropped_total", "Heartbeats dropped because the ingest queue was full")
+STORE_FLUSH_SECONDS = REGISTRY.histogram("arwin_store_flush_seconds", "Time to write a local data file, by file")
+STORE_FLUSH_BYTES = REGISTRY.counter("arwin_store_flush_bytes_total", "Bytes written to local data files, by file")
+GITHUB_SYNC_SECONDS = REGISTRY.histogram("arwin_github_sync_seconds", "Time to commit staged files to GitHub")
+GITHUB_SYNC_FAILURES = REGISTRY.counter("arwin_github_sync_failures_total", "GitHub commits that failed after retrying")
+OUTBOUND_QUEUE_DEPTH = REGISTRY.gauge("arwin_outbound_queue_depth", "Messages waiting to be sent, by channel")
+OUTBOUND_SENT = REGISTRY.counter("arwin_outbound_messages_total", "Messages sent by the outbound scheduler, by result")
+WATERMARK_SECONDS = REGISTRY.histogram("arwin_watermark_seconds", "Time from submit to watermarked image, including queueing")
+WATERMARK_FAILURES = REGISTRY.counter("arwin_watermark_failures_total", "Images that could not be watermarked")
+HISTORY_MESSAGES = REGISTRY.counter("arwin_history_messages_total", "Messages read from channel history, by channel")
+HISTORY_PAGES = REGISTRY.counter("arwin_history_pages_total", "Channel history requests (100 messages per page), by channel")
@@ -0,0 +1,145 @@
+"""GitHubSyncEngine against an in-memory stand-in for the Git Data API."""
+import base64
+import hashlib
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+
+
+def blob_sha(content):
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FakeRepo:
+    """One branch; trees are {path: blob sha}. Ref updates are fast-forward only, like GitHub's."""
+
+    def __init__(self, files):
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.head = self._commit(self._tree(files), [])
+        self.during_request = None # Called on every request, to look at the engine mid-flush
+
+    def _request(self):
+        if self.during_request:
+            self.during_request()
+
+    def _tree(self, files):
+        entries = {}
+        for path, content in files.items():
+            self.blobs[blob_sha(content)] = content
+            entries[path] = blob_sha(content)
+        sha = hashlib.sha1(repr(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = entries
+        return SimpleNamespace(sha=sha)
+
+    def _commit(self, tree, parents):
+        sha = hashlib.sha1(f"{tree.sha}{[p.sha for p in parents]}{len(self.commits)}".encode()).hexdigest()
+        commit = self.commits[sha] = SimpleNamespace(sha=sha, tree=tree)
+        return commit
+
+    def edit_out_of_band(self, path, content):
+        files = {p: self.blobs[sha] for p, sha in self.trees[self.head.tree.sha].items()}
+        files[path] = content
+        self.head = self._commit(self._tree(files), [self.head])
+
+    def content(self, path):
+        return self.blobs[self.trees[self.head.tree.sha][path]]
+
+    def get_git_ref(self, name):
+        self._request()
+        repo = self
+
+        class Ref:
+            object = SimpleNamespace(sha=repo.head.sha)
+
+            def edit(self, sha):
+                repo._request()
+                if repo.commits[sha].parent != repo.head.sha:
+                    raise RuntimeError("Update is not a fast forward")
+                repo.head = repo.commits[sha]
+        return Ref()
+
+    def get_git_commit(self, sha):
+        self._request()
+        return self.commits[sha]
+
+    def get_git_tree(self, sha, recursive=False):
+        self._request()
+        return SimpleNamespace(tree=[SimpleNamespace(path=p, sha=b, type="blob") for p, b in self.trees[sha].items()])
+
+    def create_git_blob(self, content, encoding):
+        self._request()
+        data = base64.b64decode(content)
+        self.blobs[blob_sha(data)] = data
+        return SimpleNamespace(sha=blob_sha(data))
+
+    def create_git_tree(self, elements, base_tree):
+        self._request()
+        files = {p: self.blobs[sha] for p, sha in self.trees[base_tree.sha].items()}
+        for element in elements:
+            e = element._identity
+            files[e["path"]] = e["content"].encode() if "content" in e else self.blobs[e["sha"]]
+        return self._tree(files)
+
+    def create_git_commit(self, message, tree, parents):
+        self._request()
+        commit = self._commit(tree, parents)
+        commit.parent = parents[0].sha
+        return commit
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(bot, "GITHUB_TOKEN", "test")
+    engine = bot.GitHubSyncEngine("owner/repo")
+    engine.fake = FakeRepo({"users.json": b"{}", "ids.txt": b"1"})
+    monkeypatch.setattr(engine, "repo", lambda: engine.fake)
+    engine._load_head()
+    return engine
+
+
+def test_unchanged_files_are_skipped(engine):
+    engine.stage("users.json", "{}")
+    engine.stage("ids.txt", "2")
+    assert engine.flush() == ["ids.txt"]
+    assert engine.fake.content("ids.txt") == b"2"
+
+
+def test_lock_is_free_while_requests_run(engine):
+    free = []
+    # The lock is reentrant, so probe it from another thread
+    engine.fake.during_request = lambda: free.append(probe(engine.lock))
+    engine.stage("ids.txt", "2")
+    assert engine.flush() == ["ids.txt"]
+    assert free and all(free)
+
+
+def probe(lock):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(lock.acquire(timeout=1) and (lock.release() or True)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_reloaded_head_replaces_cached_hashes(engine):
+    engine.stage("ids.txt", "2")
+    assert engine.flush() == ["ids.txt"]
+    engine.fake.edit_out_of_band("ids.txt", b"edited on GitHub")
+    engine._load_head()
+    engine.stage("ids.txt", "2") # Same content as the bot's last push, but GitHub has changed since
+    assert engine.flush() == ["ids.txt"]
+    assert engine.fake.content("ids.txt") == b"2"
+
+
+def test_moved_branch_is_retried_on_the_new_head(engine):
+    engine.stage("ids.txt", "2")
+    engine.flush()
+    engine.fake.edit_out_of_band("whitelist.txt", b"Mewtwo")
+    engine.stage("ids.txt", "3")
+    assert engine.flush() == ["ids.txt"]
+    assert engine.fake.content("ids.txt") == b"3" and engine.fake.content("whitelist.txt") == b"Mewtwo"
@@ -0,0 +1,71 @@
+"""What process_heartbeat forwards to the heartbeat monitors and the check-in ping channel."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+from heartbeat import parse_heartbeat
+
+
+def heartbeat(hb_type, offline="none"):
+    return "\n".join([
+        "Online: Main, 1, 2",
+        f"Offline: {offline}",
+        "Time: 60m | Packs: 120 | Avg: 2.00 packs/min",
+        f"Type: {hb_type}",
+        "Opening: Mewtwo",
+    ])
+
+
+@pytest.fixture
+def forwarded(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot, "DATA_FILE", str(tmp_path / "users.json"))
+    monkeypatch.setattr(bot, "USER_STORE", bot.UserStore(bot.DATA_FILE))
+    monkeypatch.setattr(bot, "PACK_SAMPLES", bot.PackSampleStore(str(tmp_path / "samples.bin")))
+    bot.USER_STORE.load()
+    bot.USER_STORE.create("42", {"username": "reroller", "friend_code": "1234567890123456", "status": "online"})
+
+    async def not_listed(*codes):
+        return False
+    monkeypatch.setattr(bot, "is_user_publicly_online", not_listed)
+
+    member = SimpleNamespace(id=42, name="reroller", mention="<@42>")
+    monkeypatch.setattr(bot.HOME_CHANNELS, "owner", lambda channel: member)
+    posts = []
+    monkeypatch.setattr(bot.OUTBOUND, "post", lambda channel, content, **_: posts.append((channel.id, content)))
+
+    client = bot.MyBot()
+    channels = {channel_id: SimpleNamespace(id=channel_id) for channel_id in (bot.HEARTBEAT_MONITOR_ID, bot.CHECKIN_PING_ID)}
+    monkeypatch.setattr(client, "get_channel", channels.get)
+
+    def run(content):
+        message = SimpleNamespace(content=content, channel=SimpleNamespace(id=1, name="home-reroller"))
+        asyncio.run(client.process_heartbeat(message, parse_heartbeat(content)))
+        return posts
+    return run
+
+
+def test_96p_heartbeat_is_forwarded(forwarded):
+    posts = forwarded(heartbeat("Inject Wonderpick 96P+"))
+    assert posts == [(bot.HEARTBEAT_MONITOR_ID, "reroller\n" + heartbeat("Inject Wonderpick 96P+"))]
+
+
+def test_create_bots_heartbeat_is_forwarded(forwarded):
+    assert len(forwarded(heartbeat("Create Bots (13P)"))) == 1
+
+
+def test_inject_13p_heartbeat_is_forwarded_without_stats(forwarded):
+    assert forwarded(heartbeat("Inject 13P+")) == [(bot.HEARTBEAT_MONITOR_ID, "reroller\n" + heartbeat("Inject 13P+"))]
+    assert "session" not in bot.USER_STORE.get("42")
+
+
+def test_offline_alert_is_queued_once_per_incident(forwarded):
+    for _ in range(3): # Before the first alert has been sent
+        posts = forwarded(heartbeat("Inject Wonderpick 96P+", offline="9"))
+    alerts = [content for channel_id, content in posts if channel_id == bot.CHECKIN_PING_ID]
+    assert len(alerts) == 1 and alerts[0].startswith("⚠️ <@42>")
+
+    forwarded(heartbeat("Inject Wonderpick 96P+"))
+    posts = forwarded(heartbeat("Inject Wonderpick 96P+", offline="9"))
+    assert sum(channel_id == bot.CHECKIN_PING_ID for channel_id, _ in posts) == 2
@@ -0,0 +1,46 @@
+"""HeartbeatIngest ordering, isolation and shutdown."""
+import asyncio
+
+import bot
+
+
+def test_order_per_key_and_slow_key_does_not_block_others():
+    async def main():
+        ingest = bot.HeartbeatIngest(limit=100)
+        done = []
+        release = asyncio.Event()
+
+        async def handle(key, n):
+            if key == "slow" and n == 0:
+                await release.wait()
+            done.append((key, n))
+
+        for n in range(3):
+            ingest.submit("slow", handle, "slow", n)
+        # Keys that shared a shard with "slow" under the old hash(key) % workers layout
+        for key in range(20):
+            ingest.submit(key, handle, key, 0)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert len(done) == 20 # Every other key finished while "slow" waits
+
+        release.set()
+        await ingest.join()
+        assert [n for key, n in done if key == "slow"] == [0, 1, 2]
+        assert ingest.pending == 0 and not ingest.tasks
+    asyncio.run(main())
+
+
+def test_submit_after_drain_is_refused():
+    async def main():
+        ingest = bot.HeartbeatIngest(limit=100)
+        handled = []
+
+        async def handle(n):
+            handled.append(n)
+
+        ingest.submit(1, handle, 1)
+        await ingest.drain(1)
+        assert not ingest.submit(1, handle, 2)
+        assert handled == [1] and ingest.refused == 1
+    asyncio.run(main())
@@ -0,0 +1,18 @@
+"""DailyLiveGps: per-user live god pack counts that reset at UTC midnight."""
+import bot
+
+
+def test_counts_per_user_and_resets_on_a_new_day(tmp_path):
+    store = bot.UserStore(str(tmp_path / "users.json"))
+    store.load()
+    live = bot.DailyLiveGps(store)
+
+    live.record(42)
+    live.record("42")
+    live.record(7)
+    assert (live.for_user(42), live.for_user("7"), live.for_user(1)) == (2, 1, 0)
+
+    store.create(live.KEY, {**store.get(live.KEY), "day": "2000-01-01"})
+    assert live.for_user(42) == 0
+    live.record(42)
+    assert store.get(live.KEY)["users"] == {"42": 1}
@@ -0,0 +1,71 @@
+"""RoleReconciler: status role diffs and per-guild role creation."""
+import asyncio
+from types import SimpleNamespace
+
+import bot
+
+
+class FakeGuild:
+    def __init__(self):
+        self.id = 1
+        self.roles = []
+        self.created = []
+
+    def get_role(self, role_id):
+        return next((r for r in self.roles if r.id == role_id), None)
+
+    async def create_role(self, name, **_):
+        await asyncio.sleep(0) # Let concurrent callers interleave
+        role = SimpleNamespace(id=len(self.roles) + 10, name=name)
+        self.roles.append(role)
+        self.created.append(name)
+        return role
+
+
+class FakeMember:
+    def __init__(self, member_id, guild, roles=()):
+        self.id, self.name, self.bot, self.guild = member_id, f"m{member_id}", False, guild
+        self.roles = list(roles)
+        self.calls = []
+
+    async def add_roles(self, *roles):
+        self.calls.append(("add", [r.name for r in roles]))
+        self.roles.extend(roles)
+
+    async def remove_roles(self, *roles):
+        self.calls.append(("remove", [r.name for r in roles]))
+        self.roles = [r for r in self.roles if r not in roles]
+
+
+def make_store(tmp_path):
+    store = bot.UserStore(str(tmp_path / "users.json"))
+    store.load()
+    return store
+
+
+def test_concurrent_reconciles_create_each_role_once(tmp_path):
+    guild = FakeGuild()
+    roles = bot.RoleReconciler(make_store(tmp_path))
+
+    async def run():
+        await asyncio.gather(*(roles.reconcile(FakeMember(i, guild)) for i in range(5)))
+    asyncio.run(run())
+    assert sorted(guild.created) == sorted([bot.ROLE_REROLLING, bot.ROLE_NOT_REROLLING])
+
+
+def test_reconcile_swaps_only_the_status_role(tmp_path):
+    store = make_store(tmp_path)
+    guild = FakeGuild()
+    roles = bot.RoleReconciler(store)
+    other = SimpleNamespace(id=99, name="Other")
+    member = FakeMember(42, guild, [other])
+
+    assert asyncio.run(roles.reconcile(member))
+    assert member.calls == [("add", [bot.ROLE_NOT_REROLLING])]
+
+    store.create("42", {"status": "online"})
+    member.calls.clear()
+    assert asyncio.run(roles.reconcile(member))
+    assert member.calls == [("remove", [bot.ROLE_NOT_REROLLING]), ("add", [bot.ROLE_REROLLING])]
+    assert other in member.roles
+    assert not asyncio.run(roles.reconcile(member))
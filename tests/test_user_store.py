@@ -0,0 +1,48 @@
+"""UserStore friend code index and published ID lists."""
+import json
+
+import pytest
+
+import bot
+
+SHARED = "6270265152175778"
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    path = tmp_path / "users.json"
+    # The same code as one user's secondary and another's primary, as in the shipped users.json
+    path.write_text(json.dumps({
+        "510537914548224005": {"friend_code": "1111222233334444", "secondary_code": SHARED, "secondary_status": "offline"},
+        "694638638746566677": {"friend_code": SHARED, "status": "offline"},
+    }))
+    monkeypatch.setattr(bot, "DATA_FILE", str(path))
+    store = bot.UserStore(str(path))
+    store.load()
+    return store
+
+
+def test_duplicate_code_keeps_first_owner(store):
+    assert store.code_owner(SHARED) == "510537914548224005"
+
+
+def test_status_change_for_user_sharing_a_code(store):
+    store.update("694638638746566677", status="online")
+    assert SHARED in store.published[1]
+    store.update("694638638746566677", status="offline")
+    assert SHARED not in store.published[1]
+    assert store.code_owner(SHARED) == "510537914548224005"
+
+
+def test_gaining_someone_elses_code_is_rejected(store):
+    with pytest.raises(bot.FriendCodeTaken):
+        store.update("694638638746566677", secondary_code="1111222233334444")
+    with pytest.raises(bot.FriendCodeTaken):
+        store.create("3", {"friend_code": SHARED})
+
+
+def test_startup_sync_sets_the_primary_holder_of_a_duplicate_online(store, monkeypatch):
+    monkeypatch.setattr(bot, "USER_STORE", store)
+    bot.sync_statuses_with_ids({SHARED})
+    assert store.get("694638638746566677")["status"] == "online"
+    assert SHARED in store.published[1]
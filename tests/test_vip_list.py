@@ -0,0 +1,35 @@
+"""VipList loading and edits."""
+import asyncio
+
+import bot
+
+
+def run_with(monkeypatch, content, body):
+    monkeypatch.setattr(bot, "_blocking_load_vip", lambda: content)
+
+    async def main():
+        vips = bot.VipList(window=3600)
+        result = await body(vips)
+        if vips._timer:
+            vips._timer.cancel()
+        return result
+    return asyncio.run(main())
+
+
+def test_duplicated_line_is_removed_in_one_go(monkeypatch):
+    async def body(vips):
+        assert await vips.remove("1111222233334444")
+        return vips
+
+    vips = run_with(monkeypatch, b"1111222233334444\n5555666677778888\n1111222233334444\n", body)
+    assert "1111222233334444" not in vips
+    assert vips.ids.render() == "5555666677778888"
+
+
+def test_changes_are_refused_until_loaded(monkeypatch):
+    async def body(vips):
+        return await vips.add("1111222233334444"), await vips.remove("5555666677778888"), vips
+
+    added, removed, vips = run_with(monkeypatch, None, body) # GitHub unreachable
+    assert (added, removed) == (False, False)
+    assert not vips.loaded and len(vips.ids) == 0
@@ -0,0 +1,195 @@
+"""Watermark for screenshots posted to the godpacks showcase.
+
+Screenshots come from a handful of device resolutions, so the translucent
+text overlay is rendered once per image size, cropped to the text's bounding
+box and cached. A repeat watermark is then one alpha_composite over that box
+plus the encode.
+
+The bot runs watermarks through WatermarkPool: worker processes (so Pillow
+work doesn't compete with the event loop for the GIL) behind a bounded number
+of in-flight images.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+import metrics
+
+WATERMARK_TEXT = "EternalGP"
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+OPACITY = 0.35
+OVERLAY_CACHE_SIZE = 32 # Distinct image sizes to keep overlays for
+WATERMARK_FORMAT = os.getenv("WATERMARK_FORMAT", "PNG").upper() # PNG or WEBP (lossless)
+
+
+def _env_int(name, default, low, high=None):
+    """Integer setting from the environment, clamped to low..high; the default if unset or invalid."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        print(f"⚠️ Invalid {name} {value!r}, using {default}", flush=True)
+        return default
+    clamped = max(low, number if high is None else min(high, number))
+    if clamped != number:
+        print(f"⚠️ {name} {number} is out of range, using {clamped}", flush=True)
+    return clamped
+
+
+WATERMARK_COMPRESSION = _env_int("WATERMARK_COMPRESSION", 1, 0, 6 if WATERMARK_FORMAT == "WEBP" else 9) # PNG compress_level 0-9 / WebP method 0-6
+WATERMARK_WORKERS = _env_int("WATERMARK_WORKERS", 2, 1)
+WATERMARK_MAX_PENDING = _env_int("WATERMARK_MAX_PENDING", 8, 1) # Images queued or in flight before callers wait
+
+# Global transparency as a lookup table for Image.point (35% opacity)
+_ALPHA_LUT = [int(p * OPACITY) for p in range(256)]
+
+# FreeType faces aren't safe to draw with from several threads at once
+_RENDER_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_font(size):
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def get_overlay(width, height):
+    """Return (tile, (x, y)) for an image size, or None if nothing is drawn."""
+    with _RENDER_LOCK:
+        txt_layer = Image.new('RGBA', (width, height), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(txt_layer)
+
+        # Calculate dynamic font size (9% of height - Fine tuned)
+        font_size = int(height * 0.09)
+        if font_size < 15: font_size = 15
+        font = get_font(font_size)
+
+        # Calculate position (Center)
+        left, top, right, bottom = draw.textbbox((0, 0), WATERMARK_TEXT, font=font)
+        x = (width - (right - left)) / 2
+        y = (height - (bottom - top)) / 2
+
+        # Calculate dynamic stroke width
+        stroke_width = max(1, int(font_size / 25))
+
+        # Draw Opaque Text with Outline
+        draw.text((x, y), WATERMARK_TEXT, font=font, fill=(255, 255, 255, 255), stroke_width=stroke_width, stroke_fill=(0, 0, 0, 255))
+
+    r, g, b, a = txt_layer.split()
+    a = a.point(_ALPHA_LUT)
+    box = a.getbbox()
+    if box is None:
+        return None
+    tile = Image.merge('RGBA', (r, g, b, a)).crop(box)
+    return tile, box[:2]
+
+
+def _save_options(fmt, compression):
+    if fmt == "WEBP":
+        return {"format": "WEBP", "lossless": True, "method": compression}
+    return {"format": "PNG", "compress_level": compression}
+
+
+def add_watermark(image_bytes, fmt="PNG", compression=6):
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img = img.convert("RGBA")
+
+            overlay = get_overlay(*img.size)
+            if overlay is not None:
+                tile, dest = overlay
+                img.alpha_composite(tile, dest=dest)
+
+            output = io.BytesIO()
+            img.save(output, **_save_options(fmt, compression))
+            output.seek(0)
+            return output
+    except Exception as e:
+        print(f"Error processing image: {e}", flush=True)
+        return None
+
+
+def render_watermark(image_bytes, fmt, compression):
+    """Worker entry point: returns (encoded bytes, render ms) or None."""
+    start = time.perf_counter()
+    output = add_watermark(image_bytes, fmt, compression)
+    if output is None:
+        return None
+    return output.getvalue(), (time.perf_counter() - start) * 1000
+
+
+class WatermarkPool:
+    """Watermarks images in worker processes with a cap on in-flight work.
+
+    submit() waits once max_pending images are queued or rendering, so a
+    burst of showcase posts queues up here instead of piling onto the pool.
+
+    start() forks the workers while the bot is still single-threaded (before
+    bot.run()), so they share its already-imported modules. Spawned workers
+    would re-run the main script, bot.py with discord.py, PyGithub and every
+    singleton, just to call render_watermark. Only a pool that has to be
+    replaced at runtime (threads running, so forking is unsafe) is spawned.
+    """
+
+    def __init__(self, workers, max_pending, fmt, compression):
+        self.workers = workers
+        self.fmt = fmt
+        self.compression = compression
+        self.extension = "webp" if fmt == "WEBP" else "png"
+        self._slots = asyncio.Semaphore(max_pending)
+        self._executor = None
+
+    def start(self):
+        """Fork the workers now. Call before any threads or the event loop start."""
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"))
+        # With fork, the executor starts every worker on the first submit
+        self._executor.submit(int).result()
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def submit(self, image_bytes, label=""):
+        """Return the watermarked image bytes, or None if it failed."""
+        queued = time.perf_counter()
+        async with self._slots:
+            waited = (time.perf_counter() - queued) * 1000
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._pool(), render_watermark, image_bytes, self.fmt, self.compression)
+            except BrokenProcessPool as e:
+                # A worker died; start a fresh pool for the next image
+                print(f"Watermark pool broken ({label}): {e}", flush=True)
+                self._executor = None
+                result = None
+            except Exception as e:
+                print(f"Watermark worker failed for {label}: {e}", flush=True)
+                result = None
+
+        if result is None:
+            metrics.WATERMARK_FAILURES.inc()
+            return None
+        data, render_ms = result
+        total_ms = (time.perf_counter() - queued) * 1000
+        metrics.WATERMARK_SECONDS.observe(total_ms / 1000)
+        print(f"🖼️ Watermarked {label} ({len(data) // 1024} KB {self.fmt}): {total_ms:.0f} ms (queue {waited:.0f} ms, render {render_ms:.0f} ms)", flush=True)
+        return data
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None